@@ -1,16 +1,21 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, Any, Tuple
+import hashlib
+import secrets
+import time
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
 from app.models.user import User
-from app.schemas.user import TokenData
+from app.schemas.user import TokenData, Principal
+from app.services.password_hasher import password_context
+from app.services.redis_service import redis_service
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# In-process helpers; request handlers hash on the password_hasher pool instead
+pwd_context = password_context(settings.auth_bcrypt_rounds)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
@@ -39,26 +44,146 @@ def verify_token(token: str, credentials_exception):
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+        token_data = TokenData(email=email, user_id=payload.get("uid"))
+    except (JWTError, ValueError):
         raise credentials_exception
     return token_data
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _token_hash(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def _parse_refresh_token(token: str) -> Optional[Tuple[int, str, str]]:
+    # {user id}.{session id}.{secret}; ids are public, only the secret's hash is stored
+    user_id, _, rest = token.partition(".")
+    session_id, _, secret = rest.partition(".")
+    if not user_id.isdigit() or not session_id or not secret:
+        return None
+    return int(user_id), session_id, secret
+
+
+async def create_session(user_id: int, subject: str, meta: Dict[str, Any]) -> Optional[str]:
+    """Open a refresh session for a user that just logged in; returns its refresh token"""
+    now = time.time()
+    # Sessions that ran past their absolute age are otherwise only removed when presented
+    sessions = await redis_service.get_user_session(user_id)
+    for session_id, session in sessions.items():
+        if session.get("expires_at", 0) < now:
+            await redis_service.delete_user_session(user_id, session_id)
+    session_id, secret = secrets.token_urlsafe(12), secrets.token_urlsafe(32)
+    created = await redis_service.set_user_session(
+        user_id, session_id, _token_hash(secret), subject, now + settings.auth_session_max_age,
+        {**meta, "created_at": now}, settings.auth_refresh_token_ttl,
+    )
+    return f"{user_id}.{session_id}.{secret}" if created else None
+
+
+async def rotate_refresh_token(token: str) -> Optional[Tuple[int, str, str]]:
+    """Swap a refresh token for its successor: (user id, subject, new refresh token).
+
+    One Redis round-trip and no database: the session stores the subject.
+    Returns None for unknown, expired, wrong or reused tokens. Only a reused
+    token (the one rotated out, presented again after auth_refresh_reuse_grace)
+    ends its session, so whichever of the legitimate client and a thief
+    refreshes next has to log in again; a concurrent refresh inside the grace
+    or a wrong secret is refused without touching the session.
+    """
+    parsed = _parse_refresh_token(token)
+    if parsed is None:
+        return None
+    user_id, session_id, secret = parsed
+    new_secret = secrets.token_urlsafe(32)
+    result, subject = await redis_service.rotate_user_session(
+        user_id, session_id, _token_hash(secret), _token_hash(new_secret), time.time(),
+        settings.auth_refresh_token_ttl, settings.auth_refresh_reuse_grace,
+    )
+    if result != 1:
+        if result == -1:
+            print(f"Refresh token reuse for user {user_id}; session {session_id} revoked")
+        return None
+    return user_id, subject, f"{user_id}.{session_id}.{new_secret}"
+
+
+def session_id_of(token: str) -> Optional[str]:
+    parsed = _parse_refresh_token(token)
+    return parsed[1] if parsed else None
+
+
+def issue_tokens(user_id: int, subject: str, refresh_token: Optional[str]) -> Dict[str, Any]:
+    """Token response for a subject, with a refresh token when a session was opened"""
+    claims = {"sub": subject}
+    if settings.auth_token_user_id_claim:
+        claims["uid"] = user_id
+    access_token = create_access_token(
+        data=claims, expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": settings.access_token_expire_minutes * 60,
+    }
+
+
+PRINCIPAL_COLUMNS = (
+    User.id, User.email, User.full_name, User.phone, User.is_active, User.is_verified, User.created_at, User.updated_at,
+)
+
+
+def _principal_key(subject: str) -> str:
+    return f"principal:{subject}"
+
+
+async def _load_principal(token_data: TokenData) -> Optional[Dict[str, Any]]:
+    # Columns only: the ORM User (and its password hash) is never loaded for authentication
+    query = select(*PRINCIPAL_COLUMNS)
+    if token_data.user_id is not None:
+        query = query.where(User.id == token_data.user_id)
+    else:
+        query = query.where(User.email == token_data.email)
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(query)).first()
+    return dict(row._mapping) if row else None
+
+
+async def get_principal(token_data: TokenData) -> Optional[Principal]:
+    """Principal for a token subject from the near cache or Redis, else the database.
+
+    Entries are tagged user:{id}, so any committed change to the user row
+    (deactivation, password or email change) drops them in every worker.
+    """
+    key = _principal_key(token_data.email)
+    data = await redis_service.get(key)
+    if data is None:
+        # With a uid claim the tag is known up front, so a change committed while
+        # loading keeps the stale row out of the cache
+        versions = None
+        if token_data.user_id is not None:
+            versions = await redis_service.tag_versions([f"user:{token_data.user_id}"])
+        data = await _load_principal(token_data)
+        if data is None:
+            return None
+        await redis_service.set(key, data, settings.auth_principal_ttl, [f"user:{data['id']}"], versions)
+    if data["email"] != token_data.email or token_data.user_id not in (None, data["id"]):
+        return None
+    return Principal.model_construct(**data)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     token_data = verify_token(token, credentials_exception)
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if user is None:
+    principal = await get_principal(token_data)
+    if principal is None:
         raise credentials_exception
-    return user
+    return principal
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
@@ -1,17 +1,50 @@
+from typing import AsyncIterator
+import asyncio
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession as _AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.db_pool import engine_options, instrument
 
-engine = create_engine(settings.database_url)
+# Sync engine: Alembic, scripts and background job workers
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+instrument(engine, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+# Session.info key: awaitables that a commit on the event loop must finish before returning
+AFTER_COMMIT = "after_commit_awaitables"
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+def async_url(url: str) -> str:
+    """database_url with its sync driver swapped for the asyncio one"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+class AsyncSession(_AsyncSession):
+    async def commit(self) -> None:
+        await super().commit()
+        # after_commit listeners run on the loop thread here and cannot block on their own
+        # work, so they leave it for the commit to await
+        pending = self.sync_session.info.pop(AFTER_COMMIT, None)
+        if pending:
+            await asyncio.wait(pending, timeout=settings.cache_invalidation_timeout)
+
+
+_async_database_url = settings.async_database_url or async_url(settings.database_url)
+async_engine = create_async_engine(_async_database_url, **engine_options(_async_database_url, asynchronous=True))
+instrument(async_engine.sync_engine, "async")
+# Without expire_on_commit, reading a committed object does not need another (implicit) query
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
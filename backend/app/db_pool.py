@@ -0,0 +1,89 @@
+from typing import Any, Dict
+import time
+import uuid
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.config import settings
+from app.metrics import Counter, Gauge, Histogram
+
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+db_pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a pooled connection, including waiting for a free one",
+    ["pool"], POOL_WAIT_BUCKETS,
+)
+db_pool_timeouts = Counter("db_pool_timeouts_total", "Checkouts that gave up after db_pool_timeout", ["pool"])
+db_pool_checked_out = Gauge("db_pool_checked_out", "Connections currently checked out of the pool", ["pool"])
+db_pool_overflow = Gauge("db_pool_overflow", "Connections open beyond db_pool_size", ["pool"])
+db_pool_connects = Counter("db_pool_connects_total", "New database connections opened", ["pool"])
+
+
+class _TimedPool:
+    """Queue pool that records how long each checkout waited and how far it overflowed"""
+
+    label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            db_pool_timeouts.inc(pool=self.label)
+            raise
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, pool=self.label)
+            db_pool_overflow.set(max(self.overflow(), 0), pool=self.label)
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        db_pool_overflow.set(max(self.overflow(), 0), pool=self.label)
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    label = "async"
+
+
+def engine_options(url: str, asynchronous: bool = False) -> Dict[str, Any]:
+    """create_engine keyword arguments for the configured pool"""
+    if make_url(url).get_backend_name() == "sqlite":
+        # Local development and tests: keep SQLAlchemy's per-file defaults
+        return {}
+    options: Dict[str, Any] = {
+        "poolclass": TimedAsyncQueuePool if asynchronous else TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if settings.db_pgbouncer and asynchronous:
+        # Transaction pooling hands each transaction to any server connection, where a
+        # statement prepared on another one does not exist: no caches, unique names
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
+
+def instrument(engine: Engine, label: str) -> None:
+    """Publish checked-out connections and new connections from pool events"""
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record) -> None:
+        db_pool_connects.inc(pool=label)
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        db_pool_checked_out.inc(pool=label)
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record) -> None:
+        db_pool_checked_out.dec(pool=label)
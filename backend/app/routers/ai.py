@@ -1,177 +1,433 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.user import User
+from app.config import settings
+from app.database import SessionLocal, get_db
+from app.schemas.user import Principal
 from app.models.property import Property
-from app.models.maintenance import MaintenanceRequest
 from app.auth import get_current_active_user
+from app.schemas.ai import AIJobCreate, AIJob, RentAnalysisBatch, CommunicationCampaign
+from app.services import ai_telemetry
+from app.services.ai_data import (
+    portfolio_data, get_owned_property, maintenance_data, rent_property_data,
+    tenant_communication_data, campaign_recipients
+)
+from app.services.ai_jobs import job_queue
 from app.services.ai_service import ai_service
+from app.services.communication_campaigns import run_campaign, get_campaign
+from app.services.insights_pregen import record_activity, fingerprint, get_cached_insights, store_insights
 from app.services.redis_service import redis_service
-from typing import List
+from app.services.rent_comparables import rent_comparables
+from typing import List, Dict, Any, AsyncIterator, Optional
+import asyncio
+import json
 
 router = APIRouter(prefix="/ai", tags=["ai-assistant"])
 
 
+async def _get_owned_property(db: AsyncSession, property_id: int, owner_id: int) -> Property:
+    property = await db.run_sync(get_owned_property, property_id, owner_id)
+    if not property:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return property
+
+
+def _with_sync_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def _load_indexed(fn, *args):
+    """Run a maintenance_index / rent_comparables loader on a sync session in a worker thread.
+
+    Their queries and NumPy work are blocking and share the index's
+    threading lock with the other workers, so none of it runs on the event loop.
+    """
+    return await asyncio.to_thread(_with_sync_session, fn, *args)
+
+
+def _sse_response(chunks: AsyncIterator[str]) -> StreamingResponse:
+    """Relay completion chunks to the client as Server-Sent Events"""
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield f"event: token\ndata: {json.dumps({'delta': chunk})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'status': 'success'})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': f'AI service error: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/insights")
 async def get_property_insights(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    refresh: bool = False,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get AI-generated property insights"""
     try:
+        await record_activity(current_user.id)
+
         # Check cache first
-        cached_insights = await redis_service.get_cached_dashboard_data(current_user.id)
-        if cached_insights and 'ai_insights' in cached_insights:
-            return cached_insights['ai_insights']
-        
+        if not refresh:
+            cached_insights = await redis_service.get_cached_dashboard_data(current_user.id)
+            if cached_insights and 'ai_insights' in cached_insights:
+                return cached_insights['ai_insights']
+
+        # Taken before reading, so a write committed meanwhile keeps this result out of the cache
+        versions = await redis_service.tag_versions(redis_service.dashboard_tags(current_user.id))
+
         # Get properties data
-        properties = db.query(Property).filter(Property.owner_id == current_user.id).all()
-        properties_data = [
-            {
-                "id": prop.id,
-                "name": prop.name,
-                "address": prop.address,
-                "city": prop.city,
-                "state": prop.state,
-                "property_type": prop.property_type,
-                "rent_amount": prop.rent_amount,
-                "bedrooms": prop.bedrooms,
-                "bathrooms": prop.bathrooms,
-                "square_feet": prop.square_feet,
-                "is_active": prop.is_active
-            }
-            for prop in properties
-        ]
-        
+        properties_data = await db.run_sync(portfolio_data, current_user.id)
+
+        # Insights stored by an earlier request or the off-peak pregeneration run
+        data_fingerprint = fingerprint(properties_data)
+        if not refresh:
+            stored = await get_cached_insights(current_user.id, data_fingerprint)
+            if stored is not None:
+                await redis_service.cache_dashboard_data(current_user.id, {"ai_insights": stored}, versions=versions)
+                return stored
+
         # Generate AI insights
-        insights = await ai_service.generate_property_insights(properties_data)
-        
+        insights = await ai_service.generate_property_insights(
+            properties_data, use_cache=not refresh, owner_id=current_user.id
+        )
+
         # Cache the results
-        await redis_service.cache_dashboard_data(current_user.id, {"ai_insights": insights})
-        
+        if "error" not in insights:
+            await store_insights(current_user.id, data_fingerprint, insights)
+            await redis_service.cache_dashboard_data(current_user.id, {"ai_insights": insights}, versions=versions)
+
         return insights
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate insights: {str(e)}")
 
 
+@router.get("/insights/stream")
+async def stream_property_insights(
+    refresh: bool = False,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream AI-generated property insights as Server-Sent Events"""
+    if not ai_service.provider:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+
+    await record_activity(current_user.id)
+    properties_data = await db.run_sync(portfolio_data, current_user.id)
+    # Return the connection to the pool before the long-lived stream starts
+    await db.close()
+    return _sse_response(ai_service.stream_property_insights(
+        properties_data, use_cache=not refresh, owner_id=current_user.id
+    ))
+
+
+@router.get("/insights/estimate")
+async def estimate_property_insights(
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Estimate prompt size and call count for /ai/insights without calling the model"""
+    return ai_service.estimate_property_insights(await db.run_sync(portfolio_data, current_user.id))
+
+
 @router.get("/maintenance-recommendations/{property_id}")
 async def get_maintenance_recommendations(
     property_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    refresh: bool = False,
+    focus: Optional[str] = None,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get AI-generated maintenance recommendations for a property"""
     try:
         # Verify property ownership
-        property = db.query(Property).filter(
-            Property.id == property_id,
-            Property.owner_id == current_user.id
-        ).first()
-        
-        if not property:
-            raise HTTPException(status_code=404, detail="Property not found")
-        
-        # Get maintenance history
-        maintenance_history = db.query(MaintenanceRequest).filter(
-            MaintenanceRequest.property_id == property_id
-        ).all()
-        
-        property_data = {
-            "id": property.id,
-            "name": property.name,
-            "address": property.address,
-            "property_type": property.property_type,
-            "bedrooms": property.bedrooms,
-            "bathrooms": property.bathrooms,
-            "square_feet": property.square_feet,
-            "rent_amount": property.rent_amount,
-            "created_at": property.created_at.isoformat()
-        }
-        
-        maintenance_data = [
-            {
-                "id": req.id,
-                "title": req.title,
-                "description": req.description,
-                "status": req.status,
-                "priority": req.priority,
-                "estimated_cost": req.estimated_cost,
-                "actual_cost": req.actual_cost,
-                "created_at": req.created_at.isoformat()
-            }
-            for req in maintenance_history
-        ]
-        
+        property = await _get_owned_property(db, property_id, current_user.id)
+
+        # Relevant, recent slice of the maintenance history (optionally focused on a topic)
+        data = await _load_indexed(maintenance_data, property, focus)
+
         # Generate recommendations
         recommendations = await ai_service.generate_maintenance_recommendations(
-            property_data, maintenance_data
+            data["property_data"], data["maintenance_history"], use_cache=not refresh, owner_id=current_user.id
         )
-        
+
         return recommendations
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
 
+@router.get("/maintenance-recommendations/{property_id}/stream")
+async def stream_maintenance_recommendations(
+    property_id: int,
+    refresh: bool = False,
+    focus: Optional[str] = None,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream AI-generated maintenance recommendations as Server-Sent Events"""
+    if not ai_service.provider:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+
+    property = await _get_owned_property(db, property_id, current_user.id)
+    await db.close()
+    data = await _load_indexed(maintenance_data, property, focus)
+    return _sse_response(ai_service.stream_maintenance_recommendations(
+        data["property_data"], data["maintenance_history"], use_cache=not refresh, owner_id=current_user.id
+    ))
+
+
+@router.post("/rent-analysis/batch")
+async def batch_rent_analysis(
+    batch: RentAnalysisBatch,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Rent analysis for many properties, streamed back as NDJSON lines as each completes"""
+    query = select(Property).where(Property.owner_id == current_user.id)
+    if batch.property_ids != "all":
+        query = query.where(Property.id.in_(batch.property_ids))
+    properties = [rent_property_data(prop) for prop in (await db.scalars(query)).all()]
+    missing = [] if batch.property_ids == "all" else sorted(set(batch.property_ids) - {p["id"] for p in properties})
+
+    # Identical listings (same location, type, size and rent) share one analysis
+    profiles: Dict[tuple, List[Dict[str, Any]]] = {}
+    for prop in properties:
+        key = tuple(prop.get(f) for f in (
+            "city", "state", "zip_code", "property_type", "bedrooms", "bathrooms", "square_feet", "rent_amount"
+        ))
+        profiles.setdefault(key, []).append(prop)
+
+    def estimate_all(sync_db: Session) -> List[Any]:
+        # One refresh, then every k-NN estimate in the same worker thread
+        rent_comparables.refresh(sync_db)
+        estimates = []
+        for group in profiles.values():
+            try:
+                estimates.append(rent_comparables.estimate(group[0]))
+            except Exception as e:
+                estimates.append(e)
+        return estimates
+
+    await db.close()
+    estimates = await _load_indexed(estimate_all)
+    narrative = batch.narrative and ai_service.provider is not None
+    semaphore = asyncio.Semaphore(settings.ai_batch_concurrency)
+
+    async def analyze(group: List[Dict[str, Any]], estimate: Any) -> List[Dict[str, Any]]:
+        ids = [prop["id"] for prop in group]
+        try:
+            async with semaphore:
+                if isinstance(estimate, Exception):
+                    raise estimate
+                result = {"status": "success", "estimate": estimate}
+                if narrative:
+                    analysis = await ai_service.analyze_rent_market(
+                        group[0], market_data=estimate, use_cache=not batch.refresh, owner_id=current_user.id
+                    )
+                    result = {**analysis, "estimate": estimate}
+        except Exception as e:
+            result = {"status": "error", "error": f"Failed to generate rent analysis: {str(e)}"}
+        return [{"property_id": property_id, **result} for property_id in ids]
+
+    async def lines():
+        for property_id in missing:
+            yield json.dumps({"property_id": property_id, "status": "error", "error": "Property not found"}) + "\n"
+        for finished in asyncio.as_completed([analyze(group, estimate) for group, estimate in zip(profiles.values(), estimates)]):
+            for item in await finished:
+                yield json.dumps(item, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/rent-analysis/{property_id}")
 async def get_rent_analysis(
     property_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    narrative: bool = True,
+    refresh: bool = False,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get AI-generated rent market analysis for a property"""
+    """Get a comparables-based rent estimate, plus AI market narrative unless narrative=false"""
     try:
         # Verify property ownership
-        property = db.query(Property).filter(
-            Property.id == property_id,
-            Property.owner_id == current_user.id
-        ).first()
-        
-        if not property:
-            raise HTTPException(status_code=404, detail="Property not found")
-        
-        property_data = {
-            "id": property.id,
-            "name": property.name,
-            "address": property.address,
-            "city": property.city,
-            "state": property.state,
-            "property_type": property.property_type,
-            "bedrooms": property.bedrooms,
-            "bathrooms": property.bathrooms,
-            "square_feet": property.square_feet,
-            "rent_amount": property.rent_amount,
-            "created_at": property.created_at.isoformat()
-        }
-        
-        # Generate rent analysis
-        analysis = await ai_service.analyze_rent_market(property_data)
-        
-        return analysis
+        property = await _get_owned_property(db, property_id, current_user.id)
+
+        property_data = rent_property_data(property)
+
+        # Local k-NN comparables: milliseconds, no LLM round-trip
+        estimate = await _load_indexed(rent_comparables.estimate_for, property_data)
+        if not narrative or not ai_service.provider:
+            return {"estimate": estimate, "status": "success"}
+
+        # Generate rent analysis grounded in the computed comparables
+        analysis = await ai_service.analyze_rent_market(
+            property_data, market_data=estimate, use_cache=not refresh, owner_id=current_user.id
+        )
+
+        return {**analysis, "estimate": estimate}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate rent analysis: {str(e)}")
 
 
+@router.get("/rent-analysis/{property_id}/stream")
+async def stream_rent_analysis(
+    property_id: int,
+    refresh: bool = False,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream AI-generated rent market analysis as Server-Sent Events"""
+    if not ai_service.provider:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+
+    property = await _get_owned_property(db, property_id, current_user.id)
+    await db.close()
+    property_data = rent_property_data(property)
+    estimate = await _load_indexed(rent_comparables.estimate_for, property_data)
+    return _sse_response(ai_service.stream_rent_analysis(
+        property_data, market_data=estimate, use_cache=not refresh, owner_id=current_user.id
+    ))
+
+
 @router.post("/generate-communication")
 async def generate_tenant_communication(
     tenant_id: int,
     context: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    refresh: bool = False,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Generate AI-powered tenant communication"""
     try:
-        # Get tenant data (simplified for this example)
-        # In a real implementation, you'd query the tenant from the database
-        tenant_data = {
-            "id": tenant_id,
-            "context": context
-        }
-        
+        # Get tenant data
+        tenant_data = await db.run_sync(tenant_communication_data, tenant_id, current_user.id)
+        if not tenant_data:
+            raise HTTPException(status_code=404, detail="Tenant not found")
+
         # Generate communication
         communication = await ai_service.generate_tenant_communication(
-            tenant_data, context
+            tenant_data, context, use_cache=not refresh, owner_id=current_user.id
         )
-        
+
         return communication
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate communication: {str(e)}")
+
+
+@router.post("/communications/campaigns")
+async def create_communication_campaign(
+    campaign: CommunicationCampaign,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Send one context to many tenants: a template per property, rendered per tenant, streamed as NDJSON"""
+    if not ai_service.provider:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+
+    recipients = await db.run_sync(
+        lambda session: campaign_recipients(
+            session, current_user.id,
+            property_ids=None if campaign.property_ids == "all" else campaign.property_ids,
+            tenant_ids=campaign.tenant_ids,
+            active_only=not campaign.include_inactive,
+        )
+    )
+    owner_id, manager_name = current_user.id, current_user.full_name
+    await db.close()
+    if not recipients:
+        raise HTTPException(status_code=404, detail="No matching tenants")
+
+    async def lines():
+        async for item in run_campaign(
+            owner_id, manager_name, campaign.context, recipients,
+            personalize=campaign.personalize, use_cache=not campaign.refresh,
+        ):
+            yield json.dumps(item, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/communications/campaigns/{campaign_id}")
+async def get_communication_campaign(
+    campaign_id: str,
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Get a stored campaign with every rendered message"""
+    campaign = await get_campaign(campaign_id)
+    if not campaign or campaign["owner_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+
+@router.get("/cache/stats")
+async def get_ai_cache_stats(current_user: Principal = Depends(get_current_active_user)):
+    """Get AI completion cache hit/miss counters for this worker"""
+    return ai_service.get_cache_stats()
+
+
+@router.get("/usage")
+async def get_ai_usage(
+    days: int = 7,
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Get AI requests, tokens and estimated cost for the current user"""
+    return await ai_telemetry.usage_summary(current_user.id, days)
+
+
+def _get_owned_job(job: Optional[Dict[str, Any]], owner_id: int) -> Dict[str, Any]:
+    if not job or job["owner_id"] != owner_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs", response_model=AIJob, status_code=202)
+async def create_ai_job(
+    job: AIJobCreate,
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Queue an AI generation to run on a background worker"""
+    if job.kind in ("maintenance", "rent") and job.property_id is None:
+        raise HTTPException(status_code=422, detail="property_id is required for this job kind")
+    if job.kind == "communication" and (job.tenant_id is None or not job.context):
+        raise HTTPException(status_code=422, detail="tenant_id and context are required for communication jobs")
+
+    params = job.dict(exclude={"kind"})
+    return await job_queue.enqueue(job.kind, current_user.id, params)
+
+
+@router.get("/jobs/{job_id}", response_model=AIJob)
+async def get_ai_job(
+    job_id: str,
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Get the status and result of a background AI job"""
+    return _get_owned_job(await job_queue.get(job_id), current_user.id)
+
+
+@router.get("/jobs/{job_id}/wait", response_model=AIJob)
+async def wait_for_ai_job(
+    job_id: str,
+    timeout: float = 30.0,
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Long-poll until a background AI job finishes or the timeout elapses"""
+    _get_owned_job(await job_queue.get(job_id), current_user.id)
+    timeout = max(0.0, min(timeout, settings.ai_jobs_max_wait))
+    return _get_owned_job(await job_queue.wait(job_id, timeout), current_user.id)
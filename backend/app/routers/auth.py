@@ -1,20 +1,35 @@
-from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import List
+import time
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models.user import User
-from app.schemas.user import UserCreate, User as UserSchema, Token
-from app.auth import verify_password, get_password_hash, create_access_token, get_current_active_user
+from app.schemas.user import UserCreate, User as UserSchema, Principal, Token, TokenRefresh, SessionInfo
+from app.auth import (
+    get_current_active_user, create_session, rotate_refresh_token, session_id_of, issue_tokens,
+)
 from app.config import settings
+from app.services.password_hasher import password_hasher, HasherSaturated, record_login
+from app.services.redis_service import redis_service
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
+def _saturated() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry",
+        headers={"Retry-After": str(settings.auth_hash_retry_after)},
+    )
+
+
 @router.post("/register", response_model=UserSchema)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = (await db.scalars(select(User).where(User.email == user.email))).first()
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -22,7 +37,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except HasherSaturated:
+        raise _saturated()
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -30,27 +48,88 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         phone=user.phone
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    started = time.perf_counter()
+    user = (await db.scalars(select(User).where(User.email == form_data.username))).first()
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        except HasherSaturated:
+            record_login("shed", time.perf_counter() - started)
+            raise _saturated()
+    if not valid:
+        record_login("failure", time.perf_counter() - started)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    if new_hash:
+        # Stored with other bcrypt parameters; upgrade while the plaintext is at hand
+        user.hashed_password = new_hash
+        await db.commit()
+    refresh_token = await create_session(user.id, user.email, {
+        "user_agent": request.headers.get("user-agent"),
+        "ip_address": request.client.host if request.client else None,
+    })
+    record_login("success", time.perf_counter() - started)
+    return issue_tokens(user.id, user.email, refresh_token)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: TokenRefresh):
+    # No bcrypt and no database: one Redis script validates and rotates the token
+    rotated = await rotate_refresh_token(body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return issue_tokens(*rotated)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: TokenRefresh, current_user: Principal = Depends(get_current_active_user)):
+    session_id = session_id_of(body.refresh_token)
+    if session_id:
+        await redis_service.delete_user_session(current_user.id, session_id)
+
+
+@router.get("/sessions", response_model=List[SessionInfo])
+async def list_sessions(current_user: Principal = Depends(get_current_active_user)):
+    sessions = await redis_service.get_user_session(current_user.id)
+    return [
+        SessionInfo(
+            session_id=session_id,
+            created_at=datetime.utcfromtimestamp(session.get("created_at", 0)),
+            expires_at=datetime.utcfromtimestamp(session.get("expires_at", 0)),
+            user_agent=session.get("user_agent"),
+            ip_address=session.get("ip_address"),
+        )
+        for session_id, session in sessions.items()
+    ]
+
+
+@router.delete("/sessions", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_sessions(current_user: Principal = Depends(get_current_active_user)):
+    """Sign out everywhere: every refresh token of the user stops working"""
+    await redis_service.delete_user_session(current_user.id)
+
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_session(session_id: str, current_user: Principal = Depends(get_current_active_user)):
+    if not await redis_service.delete_user_session(current_user.id, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
 
 
 @router.get("/me", response_model=UserSchema)
-def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_active_user)):
     return current_user
@@ -1,77 +1,121 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models.user import User
+from app.schemas.user import Principal
 from app.models.maintenance import MaintenanceRequest
 from app.models.property import Property
-from app.schemas.maintenance import MaintenanceRequest as MaintenanceRequestSchema, MaintenanceRequestCreate, MaintenanceRequestUpdate
+from app.config import settings
+from app.schemas.maintenance import (
+    MaintenanceRequest as MaintenanceRequestSchema, MaintenanceRequestCreate, MaintenanceRequestUpdate,
+    MaintenanceTriage, MaintenanceTriageRequest
+)
 from app.auth import get_current_active_user
+from app.services import http_cache
+from app.services.maintenance_index import maintenance_index
+from app.services.maintenance_triage import maintenance_triage
 
 router = APIRouter(prefix="/maintenance", tags=["maintenance"])
 
 
 @router.get("/", response_model=List[MaintenanceRequestSchema])
-def get_maintenance_requests(
+async def get_maintenance_requests(
+    http_request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get maintenance requests for properties owned by current user
-    requests = db.query(MaintenanceRequest).join(Property).filter(
+    requests_query = select(MaintenanceRequest).join(Property).where(
         Property.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return requests
+    )
+    etag, cached = await http_cache.check(http_request, response, db, requests_query, MaintenanceRequest, current_user.id, skip, limit)
+    if cached:
+        return cached
+    requests = (await db.scalars(requests_query.offset(skip).limit(limit))).all()
+    return await http_cache.respond(http_request, etag, current_user.id, requests, List[MaintenanceRequestSchema])
 
 
 @router.post("/", response_model=MaintenanceRequestSchema)
-def create_maintenance_request(
+async def create_maintenance_request(
     request: MaintenanceRequestCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify property belongs to current user
-    property = db.query(Property).filter(
+    property = (await db.scalars(select(Property).where(
         Property.id == request.property_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
     
-    db_request = MaintenanceRequest(**request.dict(), requester_id=current_user.id)
+    data = request.dict()
+    triage = maintenance_triage.suggest(request.title, request.description)
+    # Only fill in priority when the client left it at the default
+    if (triage and "priority" not in request.model_fields_set
+            and triage["priority_confidence"] >= settings.ai_triage_min_confidence):
+        data["priority"] = triage["priority"]
+
+    db_request = MaintenanceRequest(**data, requester_id=current_user.id)
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
+    await db.commit()
+    await db.refresh(db_request)
+    maintenance_index.upsert(db_request)
+    if triage:
+        db_request.suggested_priority = triage["priority"]
+        db_request.suggested_category = triage["category"]
+        db_request.triage_confidence = triage["priority_confidence"]
     return db_request
 
 
+@router.post("/triage", response_model=MaintenanceTriage)
+def triage_maintenance_request(
+    request: MaintenanceTriageRequest,
+    current_user: Principal = Depends(get_current_active_user)
+):
+    """Suggest priority and category for a request before it is submitted"""
+    triage = maintenance_triage.suggest(request.title, request.description)
+    if not triage:
+        raise HTTPException(status_code=503, detail="Triage model not available")
+    return triage
+
+
 @router.get("/{request_id}", response_model=MaintenanceRequestSchema)
-def get_maintenance_request(
+async def get_maintenance_request(
     request_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    http_request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    request = db.query(MaintenanceRequest).join(Property).filter(
+    request_query = select(MaintenanceRequest).join(Property).where(
         MaintenanceRequest.id == request_id,
         Property.owner_id == current_user.id
-    ).first()
+    )
+    etag, cached = await http_cache.check(http_request, response, db, request_query, MaintenanceRequest, current_user.id)
+    if cached:
+        return cached
+    request = (await db.scalars(request_query)).first()
     if not request:
         raise HTTPException(status_code=404, detail="Maintenance request not found")
-    return request
+    return await http_cache.respond(http_request, etag, current_user.id, request, MaintenanceRequestSchema)
 
 
 @router.put("/{request_id}", response_model=MaintenanceRequestSchema)
-def update_maintenance_request(
+async def update_maintenance_request(
     request_id: int,
     request_update: MaintenanceRequestUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    request = db.query(MaintenanceRequest).join(Property).filter(
+    request = (await db.scalars(select(MaintenanceRequest).join(Property).where(
         MaintenanceRequest.id == request_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not request:
         raise HTTPException(status_code=404, detail="Maintenance request not found")
     
@@ -79,24 +123,27 @@ def update_maintenance_request(
     for field, value in update_data.items():
         setattr(request, field, value)
     
-    db.commit()
-    db.refresh(request)
+    await db.commit()
+    await db.refresh(request)
+    maintenance_index.upsert(request)
     return request
 
 
 @router.delete("/{request_id}")
-def delete_maintenance_request(
+async def delete_maintenance_request(
     request_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    request = db.query(MaintenanceRequest).join(Property).filter(
+    request = (await db.scalars(select(MaintenanceRequest).join(Property).where(
         MaintenanceRequest.id == request_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not request:
         raise HTTPException(status_code=404, detail="Maintenance request not found")
     
-    db.delete(request)
-    db.commit()
+    property_id = request.property_id
+    await db.delete(request)
+    await db.commit()
+    maintenance_index.remove(property_id, request_id)
     return {"message": "Maintenance request deleted successfully"}
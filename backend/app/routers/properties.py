@@ -1,67 +1,79 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models.user import User
+from app.schemas.user import Principal
 from app.models.property import Property
 from app.schemas.property import Property as PropertySchema, PropertyCreate, PropertyUpdate
 from app.auth import get_current_active_user
+from app.services import http_cache
 
 router = APIRouter(prefix="/properties", tags=["properties"])
 
 
 @router.get("/", response_model=List[PropertySchema])
-def get_properties(
+async def get_properties(
+    http_request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    properties = db.query(Property).filter(
-        Property.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return properties
+    property_query = select(Property).where(Property.owner_id == current_user.id)
+    etag, cached = await http_cache.check(http_request, response, db, property_query, Property, current_user.id, skip, limit)
+    if cached:
+        return cached
+    properties = (await db.scalars(property_query.offset(skip).limit(limit))).all()
+    return await http_cache.respond(http_request, etag, current_user.id, properties, List[PropertySchema])
 
 
 @router.post("/", response_model=PropertySchema)
-def create_property(
+async def create_property(
     property: PropertyCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     db_property = Property(**property.dict(), owner_id=current_user.id)
     db.add(db_property)
-    db.commit()
-    db.refresh(db_property)
+    await db.commit()
+    await db.refresh(db_property)
     return db_property
 
 
 @router.get("/{property_id}", response_model=PropertySchema)
-def get_property(
+async def get_property(
     property_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    http_request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    property = db.query(Property).filter(
+    property_query = select(Property).where(
         Property.id == property_id,
         Property.owner_id == current_user.id
-    ).first()
+    )
+    etag, cached = await http_cache.check(http_request, response, db, property_query, Property, current_user.id)
+    if cached:
+        return cached
+    property = (await db.scalars(property_query)).first()
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
-    return property
+    return await http_cache.respond(http_request, etag, current_user.id, property, PropertySchema)
 
 
 @router.put("/{property_id}", response_model=PropertySchema)
-def update_property(
+async def update_property(
     property_id: int,
     property_update: PropertyUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    property = db.query(Property).filter(
+    property = (await db.scalars(select(Property).where(
         Property.id == property_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
     
@@ -69,24 +81,24 @@ def update_property(
     for field, value in update_data.items():
         setattr(property, field, value)
     
-    db.commit()
-    db.refresh(property)
+    await db.commit()
+    await db.refresh(property)
     return property
 
 
 @router.delete("/{property_id}")
-def delete_property(
+async def delete_property(
     property_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    property = db.query(Property).filter(
+    property = (await db.scalars(select(Property).where(
         Property.id == property_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
     
-    db.delete(property)
-    db.commit()
+    await db.delete(property)
+    await db.commit()
     return {"message": "Property deleted successfully"}
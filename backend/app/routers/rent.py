@@ -1,77 +1,91 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models.user import User
+from app.schemas.user import Principal
 from app.models.rent import RentPayment
 from app.models.property import Property
 from app.schemas.rent import RentPayment as RentPaymentSchema, RentPaymentCreate, RentPaymentUpdate
 from app.auth import get_current_active_user
+from app.services import http_cache
 
 router = APIRouter(prefix="/rent", tags=["rent"])
 
 
 @router.get("/", response_model=List[RentPaymentSchema])
-def get_rent_payments(
+async def get_rent_payments(
+    http_request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get rent payments for properties owned by current user
-    payments = db.query(RentPayment).join(Property).filter(
+    payments_query = select(RentPayment).join(Property).where(
         Property.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return payments
+    )
+    etag, cached = await http_cache.check(http_request, response, db, payments_query, RentPayment, current_user.id, skip, limit)
+    if cached:
+        return cached
+    payments = (await db.scalars(payments_query.offset(skip).limit(limit))).all()
+    return await http_cache.respond(http_request, etag, current_user.id, payments, List[RentPaymentSchema])
 
 
 @router.post("/", response_model=RentPaymentSchema)
-def create_rent_payment(
+async def create_rent_payment(
     payment: RentPaymentCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify property belongs to current user
-    property = db.query(Property).filter(
+    property = (await db.scalars(select(Property).where(
         Property.id == payment.property_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
     
     db_payment = RentPayment(**payment.dict(), payer_id=current_user.id)
     db.add(db_payment)
-    db.commit()
-    db.refresh(db_payment)
+    await db.commit()
+    await db.refresh(db_payment)
     return db_payment
 
 
 @router.get("/{payment_id}", response_model=RentPaymentSchema)
-def get_rent_payment(
+async def get_rent_payment(
     payment_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    http_request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    payment = db.query(RentPayment).join(Property).filter(
+    payment_query = select(RentPayment).join(Property).where(
         RentPayment.id == payment_id,
         Property.owner_id == current_user.id
-    ).first()
+    )
+    etag, cached = await http_cache.check(http_request, response, db, payment_query, RentPayment, current_user.id)
+    if cached:
+        return cached
+    payment = (await db.scalars(payment_query)).first()
     if not payment:
         raise HTTPException(status_code=404, detail="Rent payment not found")
-    return payment
+    return await http_cache.respond(http_request, etag, current_user.id, payment, RentPaymentSchema)
 
 
 @router.put("/{payment_id}", response_model=RentPaymentSchema)
-def update_rent_payment(
+async def update_rent_payment(
     payment_id: int,
     payment_update: RentPaymentUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    payment = db.query(RentPayment).join(Property).filter(
+    payment = (await db.scalars(select(RentPayment).join(Property).where(
         RentPayment.id == payment_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not payment:
         raise HTTPException(status_code=404, detail="Rent payment not found")
     
@@ -79,24 +93,24 @@ def update_rent_payment(
     for field, value in update_data.items():
         setattr(payment, field, value)
     
-    db.commit()
-    db.refresh(payment)
+    await db.commit()
+    await db.refresh(payment)
     return payment
 
 
 @router.delete("/{payment_id}")
-def delete_rent_payment(
+async def delete_rent_payment(
     payment_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    payment = db.query(RentPayment).join(Property).filter(
+    payment = (await db.scalars(select(RentPayment).join(Property).where(
         RentPayment.id == payment_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not payment:
         raise HTTPException(status_code=404, detail="Rent payment not found")
     
-    db.delete(payment)
-    db.commit()
+    await db.delete(payment)
+    await db.commit()
     return {"message": "Rent payment deleted successfully"}
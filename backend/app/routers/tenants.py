@@ -1,78 +1,91 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models.user import User
+from app.schemas.user import Principal
 from app.models.tenant import Tenant
 from app.models.property import Property
 from app.schemas.tenant import Tenant as TenantSchema, TenantCreate, TenantUpdate
 from app.auth import get_current_active_user
+from app.services import http_cache
 
 router = APIRouter(prefix="/tenants", tags=["tenants"])
 
 
 @router.get("/", response_model=List[TenantSchema])
-def get_tenants(
+async def get_tenants(
+    http_request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get tenants for properties owned by current user
-    tenant_query = db.query(Tenant).join(Property).filter(
+    tenant_query = select(Tenant).join(Property).where(
         Property.owner_id == current_user.id
-    ).offset(skip).limit(limit)
-    tenants = tenant_query.all()
-    return tenants
+    )
+    etag, cached = await http_cache.check(http_request, response, db, tenant_query, Tenant, current_user.id, skip, limit)
+    if cached:
+        return cached
+    tenants = (await db.scalars(tenant_query.offset(skip).limit(limit))).all()
+    return await http_cache.respond(http_request, etag, current_user.id, tenants, List[TenantSchema])
 
 
 @router.post("/", response_model=TenantSchema)
-def create_tenant(
+async def create_tenant(
     tenant: TenantCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Verify property belongs to current user
-    property = db.query(Property).filter(
+    property = (await db.scalars(select(Property).where(
         Property.id == tenant.property_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
     
     db_tenant = Tenant(**tenant.dict())
     db.add(db_tenant)
-    db.commit()
-    db.refresh(db_tenant)
+    await db.commit()
+    await db.refresh(db_tenant)
     return db_tenant
 
 
 @router.get("/{tenant_id}", response_model=TenantSchema)
-def get_tenant(
+async def get_tenant(
     tenant_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    http_request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    tenant = db.query(Tenant).join(Property).filter(
+    tenant_query = select(Tenant).join(Property).where(
         Tenant.id == tenant_id,
         Property.owner_id == current_user.id
-    ).first()
+    )
+    etag, cached = await http_cache.check(http_request, response, db, tenant_query, Tenant, current_user.id)
+    if cached:
+        return cached
+    tenant = (await db.scalars(tenant_query)).first()
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
-    return tenant
+    return await http_cache.respond(http_request, etag, current_user.id, tenant, TenantSchema)
 
 
 @router.put("/{tenant_id}", response_model=TenantSchema)
-def update_tenant(
+async def update_tenant(
     tenant_id: int,
     tenant_update: TenantUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    tenant = db.query(Tenant).join(Property).filter(
+    tenant = (await db.scalars(select(Tenant).join(Property).where(
         Tenant.id == tenant_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
     
@@ -80,24 +93,24 @@ def update_tenant(
     for field, value in update_data.items():
         setattr(tenant, field, value)
     
-    db.commit()
-    db.refresh(tenant)
+    await db.commit()
+    await db.refresh(tenant)
     return tenant
 
 
 @router.delete("/{tenant_id}")
-def delete_tenant(
+async def delete_tenant(
     tenant_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    tenant = db.query(Tenant).join(Property).filter(
+    tenant = (await db.scalars(select(Tenant).join(Property).where(
         Tenant.id == tenant_id,
         Property.owner_id == current_user.id
-    ).first()
+    ))).first()
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
     
-    db.delete(tenant)
-    db.commit()
+    await db.delete(tenant)
+    await db.commit()
     return {"message": "Tenant deleted successfully"}
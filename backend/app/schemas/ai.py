@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List, Literal, Union
+from datetime import datetime
+
+
+class AIJobCreate(BaseModel):
+    kind: Literal["insights", "maintenance", "rent", "communication"]
+    property_id: Optional[int] = None
+    tenant_id: Optional[int] = None
+    context: Optional[str] = None
+    refresh: bool = False
+
+
+class AIJob(BaseModel):
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class RentAnalysisBatch(BaseModel):
+    property_ids: Union[List[int], Literal["all"]]
+    narrative: bool = False
+    refresh: bool = False
+
+
+class CommunicationCampaign(BaseModel):
+    context: str
+    property_ids: Union[List[int], Literal["all"]] = "all"
+    tenant_ids: Optional[List[int]] = None
+    include_inactive: bool = False
+    personalize: bool = False
+    refresh: bool = False
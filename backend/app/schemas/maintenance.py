@@ -41,5 +41,20 @@ class MaintenanceRequestInDB(MaintenanceRequestBase):
         from_attributes = True
 
 
+class MaintenanceTriageRequest(BaseModel):
+    title: str
+    description: str
+
+
+class MaintenanceTriage(BaseModel):
+    priority: MaintenancePriority
+    priority_confidence: float
+    category: str
+    category_confidence: float
+
+
 class MaintenanceRequest(MaintenanceRequestInDB):
-    pass
+    # Set on create when the triage model is available
+    suggested_priority: Optional[MaintenancePriority] = None
+    suggested_category: Optional[str] = None
+    triage_confidence: Optional[float] = None
@@ -35,6 +35,11 @@ class User(UserInDB):
     pass
 
 
+class Principal(UserInDB):
+    """The authenticated user as handlers see it; cached, so never the password hash"""
+    pass
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -43,7 +48,22 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+
+class SessionInfo(BaseModel):
+    session_id: str
+    created_at: datetime
+    expires_at: datetime
+    user_agent: Optional[str] = None
+    ip_address: Optional[str] = None
 
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
@@ -0,0 +1,134 @@
+from typing import List, Dict, Any, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.property import Property
+from app.models.tenant import Tenant
+from app.services.maintenance_index import maintenance_index
+
+
+def portfolio_data(db: Session, owner_id: int) -> List[Dict[str, Any]]:
+    """Property rows fed into the insights prompt"""
+    active_tenants = (
+        db.query(Tenant.property_id, func.count(Tenant.id).label("active_tenants"))
+        .join(Property, Property.id == Tenant.property_id)
+        .filter(Property.owner_id == owner_id, Tenant.is_active == True)  # noqa: E712
+        .group_by(Tenant.property_id)
+        .subquery()
+    )
+    # Only the columns the prompt needs; large owners have thousands of rows
+    properties = db.query(
+        Property.id, Property.name, Property.address, Property.city, Property.state,
+        Property.property_type, Property.rent_amount, Property.bedrooms, Property.bathrooms,
+        Property.square_feet, Property.is_active,
+        func.coalesce(active_tenants.c.active_tenants, 0).label("active_tenants"),
+    ).outerjoin(
+        active_tenants, active_tenants.c.property_id == Property.id
+    ).filter(Property.owner_id == owner_id).order_by(Property.id).all()
+    return [
+        {
+            "id": prop.id,
+            "name": prop.name,
+            "address": prop.address,
+            "city": prop.city,
+            "state": prop.state,
+            "property_type": prop.property_type,
+            "rent_amount": prop.rent_amount,
+            "bedrooms": prop.bedrooms,
+            "bathrooms": prop.bathrooms,
+            "square_feet": prop.square_feet,
+            "is_active": prop.is_active,
+            "active_tenants": prop.active_tenants
+        }
+        for prop in properties
+    ]
+
+
+def get_owned_property(db: Session, property_id: int, owner_id: int) -> Optional[Property]:
+    """Property by id, or None if it doesn't belong to owner_id"""
+    return db.query(Property).filter(
+        Property.id == property_id,
+        Property.owner_id == owner_id
+    ).first()
+
+
+def maintenance_data(db: Session, property: Property, focus: Optional[str] = None) -> Dict[str, Any]:
+    """Property summary and the relevant slice of maintenance history fed into the maintenance prompt"""
+    history = maintenance_index.select(db, property.id, focus)
+
+    property_data = {
+        "id": property.id,
+        "name": property.name,
+        "address": property.address,
+        "property_type": property.property_type,
+        "bedrooms": property.bedrooms,
+        "bathrooms": property.bathrooms,
+        "square_feet": property.square_feet,
+        "rent_amount": property.rent_amount,
+        "created_at": property.created_at.isoformat(),
+        "maintenance_summary": history["summary"]
+    }
+    return {"property_data": property_data, "maintenance_history": history["records"]}
+
+
+def rent_property_data(property: Property) -> Dict[str, Any]:
+    """Property summary fed into the rent analysis prompt"""
+    return {
+        "id": property.id,
+        "name": property.name,
+        "address": property.address,
+        "city": property.city,
+        "state": property.state,
+        "zip_code": property.zip_code,
+        "property_type": property.property_type,
+        "bedrooms": property.bedrooms,
+        "bathrooms": property.bathrooms,
+        "square_feet": property.square_feet,
+        "rent_amount": property.rent_amount,
+        "created_at": property.created_at.isoformat()
+    }
+
+
+def _tenant_query(db: Session, owner_id: int):
+    # Only what a tenant letter needs; contact details stay out of prompts
+    return db.query(
+        Tenant.id, Tenant.full_name, Tenant.lease_start_date, Tenant.lease_end_date,
+        Tenant.monthly_rent, Tenant.is_active, Tenant.notes, Tenant.property_id,
+        Property.name.label("property_name"), Property.address.label("property_address"),
+        Property.city.label("property_city"), Property.property_type,
+    ).join(Property, Property.id == Tenant.property_id).filter(Property.owner_id == owner_id)
+
+
+def _tenant_data(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "full_name": row.full_name,
+        "lease_start_date": row.lease_start_date.isoformat() if row.lease_start_date else None,
+        "lease_end_date": row.lease_end_date.isoformat() if row.lease_end_date else None,
+        "monthly_rent": row.monthly_rent,
+        "is_active": row.is_active,
+        "notes": row.notes,
+        "property_id": row.property_id,
+        "property_name": row.property_name,
+        "property_address": row.property_address,
+        "property_city": row.property_city,
+        "property_type": row.property_type,
+    }
+
+
+def tenant_communication_data(db: Session, tenant_id: int, owner_id: int) -> Optional[Dict[str, Any]]:
+    """Tenant and property fields fed into the communication prompt, or None if not owned by owner_id"""
+    row = _tenant_query(db, owner_id).filter(Tenant.id == tenant_id).first()
+    return _tenant_data(row) if row else None
+
+
+def campaign_recipients(db: Session, owner_id: int, property_ids: Optional[List[int]] = None,
+                        tenant_ids: Optional[List[int]] = None, active_only: bool = True) -> List[Dict[str, Any]]:
+    """All tenants a campaign goes to, in one query"""
+    query = _tenant_query(db, owner_id)
+    if property_ids is not None:
+        query = query.filter(Tenant.property_id.in_(property_ids))
+    if tenant_ids is not None:
+        query = query.filter(Tenant.id.in_(tenant_ids))
+    if active_only:
+        query = query.filter(Tenant.is_active == True)  # noqa: E712
+    return [_tenant_data(row) for row in query.order_by(Tenant.property_id, Tenant.id).all()]
@@ -0,0 +1,327 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import json
+import time
+import uuid
+from app.config import settings
+from app.database import SessionLocal
+from app.services.ai_data import (
+    portfolio_data, get_owned_property, maintenance_data, rent_property_data, tenant_communication_data
+)
+from app.services.ai_service import ai_service
+from app.services.redis_service import redis_service
+from app.services.rent_comparables import rent_comparables
+
+JOB_KINDS = ("insights", "maintenance", "rent", "communication")
+TERMINAL_STATUSES = ("succeeded", "dead")
+
+
+class PermanentJobError(Exception):
+    """A job failure that retrying cannot fix (e.g. the property was deleted)"""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _load_job_inputs(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Read everything a job needs from the database in one short session"""
+    params = job["params"]
+    db = SessionLocal()
+    try:
+        if job["kind"] == "insights":
+            return {"properties": portfolio_data(db, job["owner_id"])}
+        if job["kind"] == "communication":
+            tenant_data = tenant_communication_data(db, params["tenant_id"], job["owner_id"])
+            if not tenant_data:
+                raise PermanentJobError("Tenant not found")
+            return {"tenant_data": tenant_data}
+
+        property = get_owned_property(db, params["property_id"], job["owner_id"])
+        if not property:
+            raise PermanentJobError("Property not found")
+        if job["kind"] == "maintenance":
+            return maintenance_data(db, property)
+        property_data = rent_property_data(property)
+        return {"property_data": property_data, "market_data": rent_comparables.estimate_for(db, property_data)}
+    finally:
+        db.close()
+
+
+async def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute one AI generation job and return its result payload"""
+    inputs = await asyncio.to_thread(_load_job_inputs, job)
+    use_cache = not job["params"].get("refresh", False)
+    owner_id = job["owner_id"]
+
+    if job["kind"] == "insights":
+        result = await ai_service.generate_property_insights(inputs["properties"], use_cache=use_cache, owner_id=owner_id)
+    elif job["kind"] == "maintenance":
+        result = await ai_service.generate_maintenance_recommendations(
+            inputs["property_data"], inputs["maintenance_history"], use_cache=use_cache, owner_id=owner_id
+        )
+    elif job["kind"] == "rent":
+        result = await ai_service.analyze_rent_market(
+            inputs["property_data"], market_data=inputs["market_data"], use_cache=use_cache, owner_id=owner_id
+        )
+        result["estimate"] = inputs["market_data"]
+    else:
+        result = await ai_service.generate_tenant_communication(
+            inputs["tenant_data"], job["params"]["context"], use_cache=use_cache, owner_id=owner_id
+        )
+
+    if "error" in result:
+        if result["error"] == "AI service not configured":
+            raise PermanentJobError(result["error"])
+        raise RuntimeError(result["error"])
+    return result
+
+
+class RedisJobBackend:
+    """Jobs as JSON records in Redis, with a list for ready ids and a sorted set for delayed retries.
+
+    A claimed id moves atomically onto this worker's processing list and
+    stays there until the job is settled. Workers heartbeat while alive; the
+    processing list of a worker that stops (crash, kill, OOM) is requeued by
+    whichever worker reaps it after ai_jobs_visibility_timeout.
+    """
+
+    queue_key = "ai:jobs:queue"
+    delayed_key = "ai:jobs:delayed"
+    dead_key = "ai:jobs:dead"
+    workers_key = "ai:jobs:workers"
+    heartbeat_prefix = "ai:jobs:worker:"
+    processing_prefix = "ai:jobs:processing:"
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+
+    @property
+    def processing_key(self) -> str:
+        return f"{self.processing_prefix}{self.worker_id}"
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        await redis_service.set(f"ai:job:{job['id']}", job, settings.ai_jobs_result_ttl)
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await redis_service.get(f"ai:job:{job_id}")
+
+    async def push(self, job_id: str) -> None:
+        await redis_service.push(self.queue_key, job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        return await redis_service.claim(self.queue_key, self.processing_key, timeout)
+
+    async def ack(self, job_id: str) -> None:
+        await redis_service.ack(self.processing_key, job_id)
+
+    async def heartbeat(self) -> None:
+        await redis_service.heartbeat(
+            self.workers_key, self.worker_id, f"{self.heartbeat_prefix}{self.worker_id}",
+            settings.ai_jobs_visibility_timeout,
+        )
+
+    async def reap(self) -> None:
+        for worker_id in await redis_service.expired_members(self.workers_key, self.heartbeat_prefix):
+            moved = await redis_service.requeue(f"{self.processing_prefix}{worker_id}", self.queue_key)
+            await redis_service.unregister(self.workers_key, worker_id)
+            if moved:
+                print(f"Requeued {moved} AI job(s) claimed by stopped worker {worker_id}")
+
+    async def retry_at(self, job_id: str, at: float) -> None:
+        await redis_service.schedule(self.delayed_key, job_id, at)
+
+    async def promote_due(self) -> None:
+        for job_id in await redis_service.pop_due(self.delayed_key, time.time()):
+            await self.push(job_id)
+
+    async def dead_letter(self, job_id: str) -> None:
+        await redis_service.push(self.dead_key, job_id)
+
+    async def notify(self, job_id: str) -> None:
+        await redis_service.publish(f"ai:job:done:{job_id}", "done")
+
+    async def wait_notification(self, job_id: str, timeout: float) -> None:
+        await redis_service.wait_for_message(f"ai:job:done:{job_id}", timeout)
+
+
+class MemoryJobBackend:
+    """In-process stand-in for local development; jobs are lost on restart"""
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.delayed: Dict[str, float] = {}
+        self.dead: List[str] = []
+        # Only jobs that someone is waiting on have an event
+        self.events: Dict[str, asyncio.Event] = {}
+        self.waiters: Dict[str, int] = {}
+
+    def _queue(self) -> asyncio.Queue:
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        return self.queue
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        self.jobs[job["id"]] = json.loads(json.dumps(job, default=str))
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    async def push(self, job_id: str) -> None:
+        self._queue().put_nowait(job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue().get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, job_id: str) -> None:
+        pass
+
+    async def heartbeat(self) -> None:
+        pass
+
+    async def reap(self) -> None:
+        # Jobs live and die with this process
+        pass
+
+    async def retry_at(self, job_id: str, at: float) -> None:
+        self.delayed[job_id] = at
+
+    async def promote_due(self) -> None:
+        now = time.time()
+        for job_id, at in list(self.delayed.items()):
+            if at <= now:
+                del self.delayed[job_id]
+                await self.push(job_id)
+
+    async def dead_letter(self, job_id: str) -> None:
+        self.dead.append(job_id)
+
+    async def notify(self, job_id: str) -> None:
+        event = self.events.get(job_id)
+        if event is not None:
+            event.set()
+
+    async def wait_notification(self, job_id: str, timeout: float) -> None:
+        event = self.events.setdefault(job_id, asyncio.Event())
+        self.waiters[job_id] = self.waiters.get(job_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.waiters[job_id] -= 1
+            if not self.waiters[job_id]:
+                del self.waiters[job_id]
+                del self.events[job_id]
+
+
+class JobQueue:
+    def __init__(self, backend):
+        self.backend = backend
+        self._local_workers: List[asyncio.Task] = []
+
+    async def enqueue(self, kind: str, owner_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a job record and make it visible to workers"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "owner_id": owner_id,
+            "params": params,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "updated_at": _now(),
+        }
+        await self.backend.save(job)
+        await self.backend.push(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.load(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the job once it reaches a terminal status, or its current state after timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.backend.load(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            await self.backend.wait_notification(job_id, min(settings.ai_jobs_poll_interval, remaining))
+
+    async def work(self, concurrency: int) -> None:
+        """Consume jobs with `concurrency` parallel slots until cancelled"""
+        # Registered before the first claim, so a crash right after it is still reaped
+        await self.backend.heartbeat()
+        await asyncio.gather(
+            self._promote_loop(),
+            *(self._consume() for _ in range(concurrency)),
+        )
+
+    async def _promote_loop(self) -> None:
+        while True:
+            await self.backend.heartbeat()
+            await self.backend.reap()
+            await self.backend.promote_due()
+            await asyncio.sleep(settings.ai_jobs_poll_interval)
+
+    async def _consume(self) -> None:
+        while True:
+            job_id = await self.backend.pop(settings.ai_jobs_poll_interval)
+            if job_id:
+                await self._process(job_id)
+                await self.backend.ack(job_id)
+
+    async def _process(self, job_id: str) -> None:
+        job = await self.backend.load(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return
+        if job["status"] == "running" and job["attempts"] >= settings.ai_jobs_max_attempts:
+            # Requeued from a worker that died while running it, every time: stop retrying
+            job.update(status="dead", error=job["error"] or "Worker stopped while running the job", updated_at=_now())
+            await self.backend.save(job)
+            await self.backend.dead_letter(job_id)
+            await self.backend.notify(job_id)
+            return
+
+        job.update(status="running", attempts=job["attempts"] + 1, updated_at=_now())
+        await self.backend.save(job)
+        try:
+            result = await run_job(job)
+        except Exception as e:
+            job.update(error=str(e), updated_at=_now())
+            if isinstance(e, PermanentJobError) or job["attempts"] >= settings.ai_jobs_max_attempts:
+                job["status"] = "dead"
+                await self.backend.save(job)
+                await self.backend.dead_letter(job_id)
+                await self.backend.notify(job_id)
+            else:
+                job["status"] = "retrying"
+                await self.backend.save(job)
+                backoff = settings.ai_jobs_retry_backoff * 2 ** (job["attempts"] - 1)
+                await self.backend.retry_at(job_id, time.time() + backoff)
+        else:
+            job.update(status="succeeded", result=result, error=None, updated_at=_now())
+            await self.backend.save(job)
+            await self.backend.notify(job_id)
+
+    def start_local_workers(self) -> None:
+        """Run consumers inside this process (used with the in-memory backend)"""
+        self._local_workers.append(asyncio.create_task(self.work(settings.ai_jobs_worker_concurrency)))
+
+    async def stop_local_workers(self) -> None:
+        for task in self._local_workers:
+            task.cancel()
+        await asyncio.gather(*self._local_workers, return_exceptions=True)
+        self._local_workers.clear()
+
+
+# Global instance
+job_queue = JobQueue(MemoryJobBackend() if settings.ai_jobs_backend == "memory" else RedisJobBackend())
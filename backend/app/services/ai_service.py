@@ -1,168 +1,551 @@
-from typing import List, Dict, Any
-import openai
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+import asyncio
+import hashlib
+import time
 from app.config import settings
+from app.services import ai_telemetry
+from app.services.llm_providers import build_provider
+from app.services.portfolio_summary import plan_insights, estimate_tokens
+from app.services.redis_service import redis_service
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpen, ai_retries, backoff_delay, deadline_for, hedged, is_transient,
+    is_upstream_failure, remaining,
+)
+from app.services.singleflight import singleflight
 import json
 
+
+class AIServiceBusy(Exception):
+    """Raised when no completion slot frees up within ai_queue_timeout"""
+
+
 class AIService:
     def __init__(self):
-        # Initialize OpenAI client
-        # Note: You'll need to set OPENAI_API_KEY in your environment
+        # Initialize the LLM provider selected by AI_PROVIDER
+        # Note: the openai provider needs OPENAI_API_KEY in your environment
+        # All completions are capped by a global semaphore so slow LLM calls
+        # never block the event loop.
+        self._semaphore = asyncio.Semaphore(settings.ai_max_concurrency)
+        self.model = settings.ai_model
+        self.cache_ttls = {
+            "insights": settings.ai_cache_ttl_insights,
+            "maintenance": settings.ai_cache_ttl_maintenance,
+            "rent": settings.ai_cache_ttl_rent,
+            "communication": settings.ai_cache_ttl_communication,
+            "communication_template": settings.ai_cache_ttl_communication,
+            "insights_chunk": settings.ai_cache_ttl_insights,
+        }
+        self.cache_stats = {endpoint: {"hits": 0, "misses": 0, "bypassed": 0} for endpoint in self.cache_ttls}
+        self.provider = build_provider()
+        self.breaker = CircuitBreaker(settings.ai_breaker_failure_threshold, settings.ai_breaker_reset_timeout)
+
+    async def close(self) -> None:
+        """Release pooled connections"""
+        if self.provider:
+            await self.provider.close()
+
+    def cache_key(self, system: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Stable content hash of everything that determines a completion"""
+        material = json.dumps([self.model, system, prompt, max_tokens, temperature], separators=(",", ":"))
+        return f"ai:completion:{hashlib.sha256(material.encode()).hexdigest()}"
+
+    async def _complete(self, endpoint: str, system: str, prompt: str, max_tokens: int,
+                        temperature: float = 0.7, timeout: Optional[float] = None,
+                        use_cache: bool = True, owner_id: Optional[int] = None) -> str:
+        """Return a cached completion or run one inside the global concurrency limit"""
+        started = time.perf_counter()
+        key = self.cache_key(system, prompt, max_tokens, temperature)
+        cache = "bypass" if not (settings.ai_cache_enabled and use_cache) else "miss"
         try:
-            if settings.openai_api_key and settings.openai_api_key != "your_openai_api_key_here":
-                self.client = openai.OpenAI(api_key=settings.openai_api_key)
-            else:
-                self.client = None
-        except Exception:
-            self.client = None
-    
-    async def generate_property_insights(self, properties: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate AI insights for property management"""
-        if not self.client:
-            return {"error": "AI service not configured"}
-        
+            content, cache = await self._complete_cached(
+                endpoint, key, system, prompt, max_tokens, temperature,
+                deadline_for(endpoint, timeout), use_cache, owner_id
+            )
+        except Exception as e:
+            stale = await self._load_stale(key) if self._is_unavailable(e) else None
+            if stale is None:
+                await ai_telemetry.record_request(endpoint, self.model, cache, "error",
+                                                  time.perf_counter() - started, owner_id)
+                raise
+            ai_telemetry.ai_stale_served.inc(endpoint=endpoint, error=type(e).__name__)
+            content, cache = stale, "stale"
+        await ai_telemetry.record_request(endpoint, self.model, cache, "success",
+                                          time.perf_counter() - started, owner_id)
+        return content
+
+    async def _complete_cached(self, endpoint: str, key: str, system: str, prompt: str, max_tokens: int,
+                               temperature: float, deadline: float, use_cache: bool,
+                               owner_id: Optional[int]) -> Tuple[str, str]:
+        stats = self.cache_stats.setdefault(endpoint, {"hits": 0, "misses": 0, "bypassed": 0})
+        if not (settings.ai_cache_enabled and use_cache):
+            stats["bypassed"] += 1
+            content = await self._create_completion(endpoint, system, prompt, max_tokens, temperature, deadline, owner_id)
+            await self._store(endpoint, key, content)
+            return content, "bypass"
+
+        cached = await redis_service.get(key)
+        if cached is not None:
+            stats["hits"] += 1
+            return cached["content"], "hit"
+        stats["misses"] += 1
+
+        async def compute() -> str:
+            content = await self._create_completion(endpoint, system, prompt, max_tokens, temperature, deadline, owner_id)
+            await self._store(endpoint, key, content)
+            return content
+
+        async def load() -> Optional[str]:
+            cached = await redis_service.get(key)
+            return cached["content"] if cached is not None else None
+
+        if settings.ai_singleflight_enabled:
+            return await singleflight.do(key, compute, load), "miss"
+        return await compute(), "miss"
+
+    async def _store(self, endpoint: str, key: str, content: str) -> None:
+        """Cache a fresh completion, plus a long-lived copy served while upstream is down"""
+        if settings.ai_cache_enabled:
+            await redis_service.set(key, {"content": content}, self.cache_ttls.get(endpoint, 3600))
+        await redis_service.set(f"{key}:stale", {"content": content}, settings.ai_stale_ttl)
+
+    async def _load_stale(self, key: str) -> Optional[str]:
+        cached = await redis_service.get(f"{key}:stale")
+        return cached["content"] if cached is not None else None
+
+    def _is_unavailable(self, e: Exception) -> bool:
+        return isinstance(e, (CircuitOpen, AIServiceBusy)) or is_transient(e)
+
+    async def _acquire_slot(self, deadline: float) -> None:
+        wait = min(settings.ai_queue_timeout, remaining(deadline))
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), wait)
+        except asyncio.TimeoutError:
+            raise AIServiceBusy("AI service busy, try again shortly")
+
+    async def _attempt(self, endpoint: str, messages: List[Dict[str, str]], max_tokens: int,
+                       temperature: float, deadline: float) -> Dict[str, Any]:
+        """One upstream call bounded by the deadline, hedged after the p95 latency when enabled"""
+        def call():
+            # httpx timeouts apply per read, so the total budget is enforced here
+            left = remaining(deadline)
+            return asyncio.wait_for(self.provider.complete(self.model, messages, max_tokens, temperature, left), left)
+
+        if not settings.ai_hedge_enabled:
+            return await call()
+        p95 = ai_telemetry.ai_completion_seconds.quantile(settings.ai_hedge_quantile, endpoint=endpoint, model=self.model)
+        return await hedged(endpoint, call, max(p95 or 0.0, settings.ai_hedge_min_delay), self._semaphore)
+
+    async def _create_completion(self, endpoint: str, system: str, prompt: str, max_tokens: int,
+                                 temperature: float, deadline: float,
+                                 owner_id: Optional[int] = None) -> str:
+        """Run one chat completion inside the global concurrency limit, retrying transient failures"""
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+        await self._acquire_slot(deadline)
+        try:
+            attempt = 0
+            while True:
+                remaining(deadline)
+                self.breaker.allow()
+                started = time.perf_counter()
+                try:
+                    response = await self._attempt(endpoint, messages, max_tokens, temperature, deadline)
+                except Exception as e:
+                    if not is_transient(e):
+                        self.breaker.release()
+                        raise
+                    if is_upstream_failure(e, deadline):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.release()
+                    attempt += 1
+                    delay = backoff_delay(attempt)
+                    if attempt > settings.ai_max_retries or time.monotonic() + delay >= deadline:
+                        raise
+                    ai_retries.inc(endpoint=endpoint)
+                    await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    self.breaker.release()
+                    raise
+                duration = time.perf_counter() - started
+                self.breaker.record_success()
+                break
+        finally:
+            self._semaphore.release()
+
+        await ai_telemetry.record_completion(
+            endpoint, self.model, owner_id, duration,
+            # Non-streamed responses arrive all at once
+            first_token=duration,
+            prompt_tokens=response.get("prompt_tokens") or estimate_tokens(system) + estimate_tokens(prompt),
+            completion_tokens=response.get("completion_tokens") or estimate_tokens(response["content"] or ""),
+        )
+        return response["content"]
+
+    async def _stream(self, endpoint: str, system: str, prompt: str, max_tokens: int,
+                      temperature: float = 0.7, use_cache: bool = True,
+                      owner_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield completion text as it arrives, caching the assembled result at the end"""
+        started = time.perf_counter()
+        deadline = deadline_for(endpoint)
+        stats = self.cache_stats.setdefault(endpoint, {"hits": 0, "misses": 0, "bypassed": 0})
+        key = self.cache_key(system, prompt, max_tokens, temperature)
+        if settings.ai_cache_enabled and use_cache:
+            cached = await redis_service.get(key)
+            if cached is not None:
+                stats["hits"] += 1
+                await ai_telemetry.record_request(endpoint, self.model, "hit", "success",
+                                                  time.perf_counter() - started, owner_id)
+                yield cached["content"]
+                return
+            stats["misses"] += 1
+            cache = "miss"
+        else:
+            stats["bypassed"] += 1
+            cache = "bypass"
+
+        parts = []
+        first_token = None
+        allowed = False
         try:
-            prompt = f"""
-            Analyze the following property data and provide insights:
-            
-            Properties: {json.dumps(properties, default=str)}
-            
+            await self._acquire_slot(deadline)
+        except Exception as e:
+            stale = await self._load_stale(key)
+            await ai_telemetry.record_request(endpoint, self.model, "stale" if stale else cache,
+                                              "success" if stale else "error",
+                                              time.perf_counter() - started, owner_id)
+            if stale is None:
+                raise
+            yield stale
+            return
+        try:
+            self.breaker.allow()
+            allowed = True
+            upstream_started = time.perf_counter()
+            stream = self.provider.stream(
+                self.model,
+                [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens,
+                temperature,
+                remaining(deadline),
+            )
+            async for delta in stream:
+                if first_token is None:
+                    first_token = time.perf_counter() - upstream_started
+                    self.breaker.record_success()
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            if allowed and first_token is None and is_upstream_failure(e, deadline):
+                self.breaker.record_failure()
+                allowed = False
+            # Nothing sent yet: a stale result is still a clean answer
+            stale = await self._load_stale(key) if first_token is None and self._is_unavailable(e) else None
+            await ai_telemetry.record_request(endpoint, self.model, "stale" if stale else cache,
+                                              "success" if stale else "error",
+                                              time.perf_counter() - started, owner_id)
+            if stale is None:
+                raise
+            yield stale
+            return
+        finally:
+            if allowed and first_token is None:
+                self.breaker.release()
+            self._semaphore.release()
+
+        content = "".join(parts)
+        duration = time.perf_counter() - upstream_started
+        # Streamed responses carry no usage block, so both sides are estimated
+        await ai_telemetry.record_completion(
+            endpoint, self.model, owner_id, duration,
+            first_token=first_token if first_token is not None else duration,
+            prompt_tokens=estimate_tokens(system) + estimate_tokens(prompt),
+            completion_tokens=estimate_tokens(content),
+        )
+        await ai_telemetry.record_request(endpoint, self.model, cache, "success",
+                                          time.perf_counter() - started, owner_id)
+        await self._store(endpoint, key, content)
+
+    def _error_result(self, e: Exception) -> Dict[str, Any]:
+        if self._is_unavailable(e):
+            # Fail fast with a retryable status rather than a generic error
+            return {"error": f"AI service unavailable: {str(e) or type(e).__name__}", "status": "unavailable"}
+        return {"error": f"AI service error: {str(e)}"}
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint cache hit/miss counters for this worker"""
+        result = {}
+        for endpoint, stats in self.cache_stats.items():
+            lookups = stats["hits"] + stats["misses"]
+            result[endpoint] = {**stats, "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None}
+        return result
+
+    def _insights_chunk_prompt(self, chunk: str) -> Tuple[str, str, int]:
+        max_tokens = settings.ai_portfolio_chunk_summary_tokens
+        prompt = f"""
+            Summarize this segment of a landlord's portfolio for a portfolio-level review
+            in at most {max_tokens} tokens. Cover pricing versus the segment averages,
+            vacancy, and any rent outliers by id.
+
+            {chunk}
+            """
+        system = "You are a property management AI assistant. Summarize portfolio data concisely and factually."
+        return system, prompt, max_tokens
+
+    def _insights_final_prompt(self, plan: Dict[str, Any], summaries: List[str]) -> Tuple[str, str, int]:
+        segments = ""
+        if plan["chunks"]:
+            segments = "Segment summaries:\n" + "\n".join(f"- {summary}" for summary in summaries)
+        prompt = f"""
+            Analyze the following property portfolio and provide insights:
+
+            {plan["body"]}
+
+            {segments}
+
             Please provide:
             1. Market analysis and recommendations
             2. Maintenance suggestions
             3. Rent optimization opportunities
             4. Risk assessment
             5. General property management advice
-            
+
             Format as JSON with clear, actionable insights.
             """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a property management AI assistant. Provide practical, actionable insights for landlords."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.7
-            )
-            
-            return {
-                "insights": response.choices[0].message.content,
-                "status": "success"
-            }
-        except Exception as e:
-            return {"error": f"AI service error: {str(e)}"}
-    
-    async def generate_maintenance_recommendations(self, property_data: Dict[str, Any], maintenance_history: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate maintenance recommendations based on property and history"""
-        if not self.client:
-            return {"error": "AI service not configured"}
-        
-        try:
-            prompt = f"""
+        system = "You are a property management AI assistant. Provide practical, actionable insights for landlords."
+        return system, prompt, 1000
+
+    async def _insights_prompt(self, properties: List[Dict[str, Any]], use_cache: bool = True,
+                              owner_id: Optional[int] = None) -> Tuple[str, str, int]:
+        """Build the insights prompt, running the map phase first for large portfolios"""
+        plan = plan_insights(properties)
+        summaries = await asyncio.gather(*(
+            self._complete("insights_chunk", *self._insights_chunk_prompt(chunk), use_cache=use_cache, owner_id=owner_id)
+            for chunk in plan["chunks"]
+        ))
+        return self._insights_final_prompt(plan, list(summaries))
+
+    def estimate_property_insights(self, properties: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Report prompt sizes for an insights request without calling the model"""
+        plan = plan_insights(properties)
+        map_tokens = []
+        for chunk in plan["chunks"]:
+            system, prompt, _ = self._insights_chunk_prompt(chunk)
+            map_tokens.append(estimate_tokens(system) + estimate_tokens(prompt))
+        system, prompt, max_tokens = self._insights_final_prompt(plan, [])
+        final_tokens = estimate_tokens(system) + estimate_tokens(prompt) \
+            + len(plan["chunks"]) * settings.ai_portfolio_chunk_summary_tokens
+        return {
+            "mode": plan["mode"],
+            "properties": len(properties),
+            "calls": len(map_tokens) + 1,
+            "map_prompt_tokens": map_tokens,
+            "final_prompt_tokens": final_tokens,
+            "total_prompt_tokens": sum(map_tokens) + final_tokens,
+            "max_completion_tokens": max_tokens + len(map_tokens) * settings.ai_portfolio_chunk_summary_tokens,
+            "unsummarized_prompt_tokens": estimate_tokens(json.dumps(properties, default=str)),
+        }
+
+    def _maintenance_prompt(self, property_data: Dict[str, Any], maintenance_history: List[Dict[str, Any]]) -> Tuple[str, str, int]:
+        prompt = f"""
             Based on this property and maintenance history, provide recommendations:
-            
+
             Property: {json.dumps(property_data, default=str)}
             Maintenance History: {json.dumps(maintenance_history, default=str)}
-            
+
             Provide:
             1. Preventive maintenance suggestions
             2. Priority items to address
             3. Cost estimates
             4. Timeline recommendations
             5. Vendor suggestions if applicable
-            
+
             Format as JSON with actionable recommendations.
             """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a property maintenance AI assistant. Provide practical maintenance recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=800,
-                temperature=0.7
-            )
-            
-            return {
-                "recommendations": response.choices[0].message.content,
-                "status": "success"
-            }
-        except Exception as e:
-            return {"error": f"AI service error: {str(e)}"}
-    
-    async def analyze_rent_market(self, property_data: Dict[str, Any], market_data: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Analyze rent pricing and market conditions"""
-        if not self.client:
-            return {"error": "AI service not configured"}
-        
-        try:
-            prompt = f"""
+        system = "You are a property maintenance AI assistant. Provide practical maintenance recommendations."
+        return system, prompt, 800
+
+    def _rent_prompt(self, property_data: Dict[str, Any], market_data: Dict[str, Any] = None) -> Tuple[str, str, int]:
+        prompt = f"""
             Analyze rent pricing for this property:
-            
+
             Property: {json.dumps(property_data, default=str)}
             Market Data: {json.dumps(market_data or {}, default=str)}
-            
+
             Provide:
             1. Recommended rent price
             2. Market comparison
             3. Pricing strategy
             4. Seasonal considerations
             5. Competitive analysis
-            
+
             Format as JSON with pricing recommendations.
             """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a real estate pricing AI assistant. Provide data-driven rent pricing recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=600,
-                temperature=0.7
-            )
-            
+        system = "You are a real estate pricing AI assistant. Provide data-driven rent pricing recommendations."
+        return system, prompt, 600
+
+    def _communication_prompt(self, tenant_data: Dict[str, Any], context: str) -> Tuple[str, str, int]:
+        prompt = f"""
+            Generate a professional communication for this tenant:
+
+            Tenant: {json.dumps(tenant_data, default=str)}
+            Context: {context}
+
+            Create a professional, friendly, and clear message that addresses the context.
+            Include appropriate tone and necessary details.
+            """
+        system = "You are a property management communication AI. Generate professional, friendly tenant communications."
+        return system, prompt, 400
+
+    def _communication_template_prompt(self, property_data: Dict[str, Any], context: str,
+                                       fields: List[str]) -> Tuple[str, str, int]:
+        placeholders = ", ".join("{{%s}}" % field for field in fields)
+        prompt = f"""
+            Write one message template to send to every tenant of this property:
+
+            Property: {json.dumps(property_data, default=str)}
+            Context: {context}
+
+            Use these placeholders wherever tenant-specific details belong: {placeholders}.
+            Do not invent names, amounts or dates; use the placeholders instead.
+            Return only the message text.
+            """
+        system = "You are a property management communication AI. Generate professional, friendly tenant communications."
+        return system, prompt, 400
+
+    def _personalize_prompt(self, message: str, tenant_data: Dict[str, Any], context: str) -> Tuple[str, str, int]:
+        prompt = f"""
+            Lightly personalize this tenant message using what we know about the tenant:
+
+            Message: {message}
+            Tenant: {json.dumps(tenant_data, default=str)}
+            Context: {context}
+
+            Keep every fact, amount and date in the message unchanged.
+            Return only the final message text.
+            """
+        system = "You are a property management communication AI. Generate professional, friendly tenant communications."
+        return system, prompt, 400
+
+    async def generate_property_insights(self, properties: List[Dict[str, Any]], use_cache: bool = True, owner_id: Optional[int] = None) -> Dict[str, Any]:
+        """Generate AI insights for property management"""
+        if not self.provider:
+            return {"error": "AI service not configured"}
+
+        try:
+            system, prompt, max_tokens = await self._insights_prompt(properties, use_cache, owner_id)
+            content = await self._complete("insights", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
+
+            return {
+                "insights": content,
+                "status": "success"
+            }
+        except Exception as e:
+            return self._error_result(e)
+
+    async def generate_maintenance_recommendations(self, property_data: Dict[str, Any], maintenance_history: List[Dict[str, Any]], use_cache: bool = True, owner_id: Optional[int] = None) -> Dict[str, Any]:
+        """Generate maintenance recommendations based on property and history"""
+        if not self.provider:
+            return {"error": "AI service not configured"}
+
+        try:
+            system, prompt, max_tokens = self._maintenance_prompt(property_data, maintenance_history)
+            content = await self._complete("maintenance", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
+
+            return {
+                "recommendations": content,
+                "status": "success"
+            }
+        except Exception as e:
+            return self._error_result(e)
+
+    async def analyze_rent_market(self, property_data: Dict[str, Any], market_data: Dict[str, Any] = None, use_cache: bool = True, owner_id: Optional[int] = None) -> Dict[str, Any]:
+        """Analyze rent pricing and market conditions"""
+        if not self.provider:
+            return {"error": "AI service not configured"}
+
+        try:
+            system, prompt, max_tokens = self._rent_prompt(property_data, market_data)
+            content = await self._complete("rent", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
+
             return {
-                "analysis": response.choices[0].message.content,
+                "analysis": content,
                 "status": "success"
             }
         except Exception as e:
-            return {"error": f"AI service error: {str(e)}"}
-    
-    async def generate_tenant_communication(self, tenant_data: Dict[str, Any], context: str) -> Dict[str, Any]:
+            return self._error_result(e)
+
+    async def generate_tenant_communication(self, tenant_data: Dict[str, Any], context: str, use_cache: bool = True, owner_id: Optional[int] = None) -> Dict[str, Any]:
         """Generate professional tenant communications"""
-        if not self.client:
+        if not self.provider:
             return {"error": "AI service not configured"}
-        
+
         try:
-            prompt = f"""
-            Generate a professional communication for this tenant:
-            
-            Tenant: {json.dumps(tenant_data, default=str)}
-            Context: {context}
-            
-            Create a professional, friendly, and clear message that addresses the context.
-            Include appropriate tone and necessary details.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a property management communication AI. Generate professional, friendly tenant communications."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=400,
-                temperature=0.7
-            )
-            
+            system, prompt, max_tokens = self._communication_prompt(tenant_data, context)
+            content = await self._complete("communication", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
+
             return {
-                "message": response.choices[0].message.content,
+                "message": content,
                 "status": "success"
             }
         except Exception as e:
-            return {"error": f"AI service error: {str(e)}"}
+            return self._error_result(e)
+
+    async def generate_communication_template(self, property_data: Dict[str, Any], context: str, fields: List[str],
+                                              use_cache: bool = True, owner_id: Optional[int] = None) -> Dict[str, Any]:
+        """Generate one placeholder template for a campaign to every tenant of a property"""
+        if not self.provider:
+            return {"error": "AI service not configured"}
+
+        try:
+            system, prompt, max_tokens = self._communication_template_prompt(property_data, context, fields)
+            content = await self._complete("communication_template", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
+
+            return {
+                "template": content,
+                "status": "success"
+            }
+        except Exception as e:
+            return self._error_result(e)
+
+    async def personalize_communication(self, message: str, tenant_data: Dict[str, Any], context: str,
+                                        use_cache: bool = True, owner_id: Optional[int] = None) -> Dict[str, Any]:
+        """Adapt a rendered campaign message to one tenant"""
+        if not self.provider:
+            return {"error": "AI service not configured"}
+
+        try:
+            system, prompt, max_tokens = self._personalize_prompt(message, tenant_data, context)
+            content = await self._complete("communication", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
+
+            return {
+                "message": content,
+                "status": "success"
+            }
+        except Exception as e:
+            return self._error_result(e)
+
+    async def stream_property_insights(self, properties: List[Dict[str, Any]], use_cache: bool = True, owner_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream AI insights for property management"""
+        system, prompt, max_tokens = await self._insights_prompt(properties, use_cache, owner_id)
+        async for chunk in self._stream("insights", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id):
+            yield chunk
+
+    def stream_maintenance_recommendations(self, property_data: Dict[str, Any], maintenance_history: List[Dict[str, Any]], use_cache: bool = True, owner_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream maintenance recommendations based on property and history"""
+        system, prompt, max_tokens = self._maintenance_prompt(property_data, maintenance_history)
+        return self._stream("maintenance", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
+
+    def stream_rent_analysis(self, property_data: Dict[str, Any], market_data: Dict[str, Any] = None, use_cache: bool = True, owner_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream rent pricing and market analysis"""
+        system, prompt, max_tokens = self._rent_prompt(property_data, market_data)
+        return self._stream("rent", system, prompt, max_tokens, use_cache=use_cache, owner_id=owner_id)
 
 # Global instance
 ai_service = AIService()
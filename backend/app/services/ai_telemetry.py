@@ -0,0 +1,107 @@
+from typing import Any, Dict, Optional
+from datetime import date, timedelta
+from app.config import settings
+from app.metrics import Counter, Histogram
+from app.services.redis_service import redis_service
+
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+ai_requests = Counter(
+    "ai_requests_total", "AI requests by endpoint, cache outcome and result",
+    ["endpoint", "model", "cache", "outcome"],
+)
+ai_request_seconds = Histogram(
+    "ai_request_duration_seconds", "Wall time of AI requests including cache lookups",
+    ["endpoint", "cache"],
+)
+ai_completion_seconds = Histogram(
+    "ai_completion_duration_seconds", "Wall time of upstream completions", ["endpoint", "model"],
+)
+ai_first_token_seconds = Histogram(
+    "ai_time_to_first_token_seconds", "Time until the first completion token arrived", ["endpoint", "model"],
+)
+ai_prompt_tokens = Histogram(
+    "ai_prompt_tokens", "Prompt tokens per upstream completion", ["endpoint", "model"], buckets=TOKEN_BUCKETS,
+)
+ai_tokens = Counter("ai_tokens_total", "Tokens consumed by upstream completions", ["endpoint", "model", "kind"])
+ai_cost = Counter("ai_cost_dollars_total", "Estimated spend on upstream completions", ["endpoint", "model"])
+ai_stale_served = Counter(
+    "ai_stale_served_total", "Last good results served while the provider was unavailable", ["endpoint", "error"],
+)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Dollar cost from the per-1K-token prices in settings.ai_pricing"""
+    prompt_price, completion_price = settings.ai_pricing.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def _usage_key(owner_id: int, day: date) -> str:
+    return f"ai:usage:{owner_id}:{day.isoformat()}"
+
+
+async def _record_usage(owner_id: Optional[int], fields: Dict[str, float]) -> None:
+    if owner_id is None:
+        return
+    expire = settings.ai_usage_retention_days * 86400
+    await redis_service.increment_hash(_usage_key(owner_id, date.today()), fields, expire)
+
+
+async def record_request(endpoint: str, model: str, cache: str, outcome: str,
+                         duration: float, owner_id: Optional[int]) -> None:
+    """One call into AIService: cache outcome and end-to-end latency"""
+    ai_requests.inc(endpoint=endpoint, model=model, cache=cache, outcome=outcome)
+    ai_request_seconds.observe(duration, endpoint=endpoint, cache=cache)
+    await _record_usage(owner_id, {"requests": 1, f"cache_{cache}": 1, f"requests:{endpoint}": 1})
+
+
+async def record_completion(endpoint: str, model: str, owner_id: Optional[int], duration: float,
+                            first_token: float, prompt_tokens: int, completion_tokens: int) -> None:
+    """One upstream completion: latency, tokens and estimated cost"""
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    ai_completion_seconds.observe(duration, endpoint=endpoint, model=model)
+    ai_first_token_seconds.observe(first_token, endpoint=endpoint, model=model)
+    ai_prompt_tokens.observe(prompt_tokens, endpoint=endpoint, model=model)
+    ai_tokens.inc(prompt_tokens, endpoint=endpoint, model=model, kind="prompt")
+    ai_tokens.inc(completion_tokens, endpoint=endpoint, model=model, kind="completion")
+    ai_cost.inc(cost, endpoint=endpoint, model=model)
+    await _record_usage(owner_id, {
+        "completions": 1,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": cost,
+        f"cost_usd:{endpoint}": cost,
+    })
+
+
+async def usage_summary(owner_id: int, days: int) -> Dict[str, Any]:
+    """Per-owner usage over the last `days` days, summed from the daily Redis hashes"""
+    days = max(1, min(days, settings.ai_usage_retention_days))
+    today = date.today()
+    totals: Dict[str, float] = {}
+    daily = []
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        values = await redis_service.get_hash(_usage_key(owner_id, day))
+        daily.append({"date": day.isoformat(), **values})
+        for field, value in values.items():
+            totals[field] = totals.get(field, 0.0) + value
+
+    by_endpoint = {
+        field.split(":", 1)[1]: {"cost_usd": round(value, 6)}
+        for field, value in totals.items() if field.startswith("cost_usd:")
+    }
+    for field, value in totals.items():
+        if field.startswith("requests:"):
+            by_endpoint.setdefault(field.split(":", 1)[1], {})["requests"] = int(value)
+    return {
+        "days": days,
+        "requests": int(totals.get("requests", 0)),
+        "completions": int(totals.get("completions", 0)),
+        "prompt_tokens": int(totals.get("prompt_tokens", 0)),
+        "completion_tokens": int(totals.get("completion_tokens", 0)),
+        "cost_usd": round(totals.get("cost_usd", 0.0), 6),
+        "cache": {k[len("cache_"):]: int(v) for k, v in totals.items() if k.startswith("cache_")},
+        "by_endpoint": by_endpoint,
+        "daily": daily,
+    }
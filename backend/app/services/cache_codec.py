@@ -0,0 +1,251 @@
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+import importlib
+import json
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib json codec
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional; values are stored uncompressed
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional
+    lz4_frame = None
+
+# Framed values start with one header byte: 0b100CCSSS (C = compression, S = serializer).
+# Values written before the codec layer are ASCII JSON, so their first byte is < 0x80.
+# A future layout can take 0xA0 and up without flushing the cache.
+HEADER = 0x80
+SERIALIZERS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSIONS = {"none": 0, "zstd": 1, "lz4": 2}
+
+# In JSON, dates, enums and decimals travel as one-key objects such as {"$date": "2026-01-31"}
+# so they decode to the same type; msgpack carries them as extension types instead.
+# orjson writes str/int enums natively as their values, so only json and msgpack keep enums.
+_JSON_TYPES = ("$datetime", "$date", "$time", "$decimal", "$enum")
+_TYPE_MARKER = b'{"$'
+_EXT_CODES = {"$datetime": 1, "$date": 2, "$time": 3, "$decimal": 4, "$enum": 5}
+_EXT_NAMES = {code: name for name, code in _EXT_CODES.items()}
+# Enums are only re-imported from the application's own modules
+ENUM_MODULE_PREFIX = "app."
+
+
+def _typed(obj: Any) -> Optional[Tuple[str, Any]]:
+    if isinstance(obj, Enum):
+        cls = type(obj)
+        return "$enum", [f"{cls.__module__}:{cls.__qualname__}", obj.value]
+    if isinstance(obj, datetime):
+        return "$datetime", obj.isoformat()
+    if isinstance(obj, date):
+        return "$date", obj.isoformat()
+    if isinstance(obj, time):
+        return "$time", obj.isoformat()
+    if isinstance(obj, Decimal):
+        return "$decimal", str(obj)
+    return None
+
+
+def _plain(obj: Any) -> Any:
+    # Subclasses of builtins reach here under orjson/msgpack strict typing
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return list(obj)
+    for base in (int, float, str):
+        if isinstance(obj, base):
+            return base(obj)
+    if hasattr(obj, "dtype") and hasattr(obj, "item"):
+        return obj.item()
+    # Same fallback as the previous json.dumps(value, default=str)
+    return str(obj)
+
+
+def _json_default(obj: Any) -> Any:
+    typed = _typed(obj)
+    return {typed[0]: typed[1]} if typed else _plain(obj)
+
+
+def _msgpack_default(obj: Any) -> Any:
+    typed = _typed(obj)
+    if typed is None:
+        return _plain(obj)
+    name, value = typed
+    data = msgpack.packb(value, use_bin_type=True) if name == "$enum" else value.encode()
+    return msgpack.ExtType(_EXT_CODES[name], data)
+
+
+@lru_cache(maxsize=256)
+def _enum_class(path: str) -> Optional[type]:
+    module_name, _, qualname = path.partition(":")
+    if not module_name.startswith(ENUM_MODULE_PREFIX):
+        return None
+    try:
+        cls: Any = importlib.import_module(module_name)
+        for part in qualname.split("."):
+            cls = getattr(cls, part)
+    except Exception:
+        return None
+    return cls if isinstance(cls, type) and issubclass(cls, Enum) else None
+
+
+def _enum(path: str, value: Any) -> Any:
+    cls = _enum_class(path)
+    try:
+        return cls(value) if cls is not None else value
+    except ValueError:
+        # Member removed since the value was cached
+        return value
+
+
+def _from_typed(name: str, value: Any) -> Any:
+    if name == "$datetime":
+        return datetime.fromisoformat(value)
+    if name == "$date":
+        return date.fromisoformat(value)
+    if name == "$time":
+        return time.fromisoformat(value)
+    if name == "$decimal":
+        return Decimal(value)
+    return _enum(*value)
+
+
+def _restore(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        name = next(iter(obj))
+        if name in _JSON_TYPES:
+            return _from_typed(name, obj[name])
+    return obj
+
+
+def _restore_tree(value: Any) -> Any:
+    if isinstance(value, dict):
+        return _restore({key: _restore_tree(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_restore_tree(item) for item in value]
+    return value
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    name = _EXT_NAMES.get(code)
+    if name is None:
+        return msgpack.ExtType(code, data)
+    return _from_typed(name, msgpack.unpackb(data, raw=False) if name == "$enum" else data.decode())
+
+
+def _prepare(value: Any) -> Any:
+    # The stdlib encoder writes str/int enums as plain values without asking `default`
+    if isinstance(value, Enum):
+        return _json_default(value)
+    if isinstance(value, dict):
+        return {key: _prepare(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_prepare(item) for item in value]
+    return value
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(_prepare(value), separators=(",", ":"), ensure_ascii=False, default=_json_default).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data, object_hook=_restore)
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(
+        value, default=_json_default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def _orjson_loads(data: bytes) -> Any:
+    value = orjson.loads(data)
+    # Only pay for the walk when a typed value is present
+    return _restore_tree(value) if _TYPE_MARKER in data else value
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=_msgpack_default, strict_types=True, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+_SERIALIZERS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any], bool]] = {
+    "json": (_json_dumps, _json_loads, True),
+    "orjson": (_orjson_dumps, _orjson_loads, orjson is not None),
+    "msgpack": (_msgpack_dumps, _msgpack_loads, msgpack is not None),
+}
+
+_COMPRESSORS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes], bool]] = {
+    "zstd": (
+        lambda data: zstandard.compress(data, settings.cache_compression_level),
+        lambda data: zstandard.decompress(data),
+        zstandard is not None,
+    ),
+    "lz4": (lambda data: lz4_frame.compress(data), lambda data: lz4_frame.decompress(data), lz4_frame is not None),
+}
+
+_SERIALIZER_NAMES = {code: name for name, code in SERIALIZERS.items()}
+_COMPRESSION_NAMES = {code: name for name, code in COMPRESSIONS.items()}
+
+
+def available(name: str) -> bool:
+    if name == "none":
+        return True
+    entry = _SERIALIZERS.get(name) or _COMPRESSORS.get(name)
+    return bool(entry and entry[2])
+
+
+def _resolve(name: str, fallback: str, kind: str) -> str:
+    if available(name):
+        return name
+    print(f"Cache {kind} '{name}' is not available; using '{fallback}'")
+    return fallback
+
+
+serializer = _resolve(settings.cache_serializer, "json", "serializer")
+compression = _resolve(settings.cache_compression, "none", "compression")
+
+
+def encode(value: Any, serializer_name: str = None, compression_name: str = None) -> bytes:
+    """Serialize value behind a header byte; compressed when above the threshold and smaller"""
+    serializer_name = serializer_name or serializer
+    compression_name = compression_name or compression
+    payload = _SERIALIZERS[serializer_name][0](value)
+    used = "none"
+    if compression_name != "none" and len(payload) >= settings.cache_compression_threshold:
+        compressed = _COMPRESSORS[compression_name][0](payload)
+        if len(compressed) < len(payload):
+            payload, used = compressed, compression_name
+    return bytes((HEADER | COMPRESSIONS[used] << 3 | SERIALIZERS[serializer_name],)) + payload
+
+
+def decode(data: Union[bytes, str]) -> Any:
+    """Decode a framed value, or a plain JSON value written before the codec layer"""
+    if isinstance(data, str):
+        data = data.encode()
+    if not data or data[0] < HEADER:
+        return json.loads(data)
+    header = data[0]
+    payload = data[1:]
+    compression_name = _COMPRESSION_NAMES[(header >> 3) & 0x03]
+    if compression_name != "none":
+        payload = _COMPRESSORS[compression_name][1](payload)
+    return _SERIALIZERS[_SERIALIZER_NAMES[header & 0x07]][1](payload)
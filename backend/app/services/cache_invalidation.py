@@ -0,0 +1,143 @@
+from typing import Set, Iterable, Optional
+from itertools import chain
+import asyncio
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import AFTER_COMMIT
+from app.models.property import Property
+from app.services.redis_service import redis_service
+
+_PENDING_TAGS = "cache_tags"
+_PENDING_REVOCATIONS = "revoke_sessions"
+# A committed change to one of these ends the user's refresh sessions. Not the password
+# hash: logins rehash it, and a password change endpoint should revoke explicitly.
+SESSION_ATTRIBUTES = ("email", "is_active")
+
+# Loop that serves requests; commits in threadpool workers hand invalidations to it
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def bind_loop(loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+    """Capture the event loop that owns the Redis clients (call at startup)"""
+    global _loop
+    _loop = loop or asyncio.get_running_loop()
+
+
+def _values(obj, attr: str) -> Set[int]:
+    """Current and pre-flush values of an attribute, so moves invalidate both sides"""
+    state = inspect(obj)
+    if attr not in state.mapper.column_attrs:
+        return set()
+    history = state.attrs[attr].history
+    return {value for value in chain(history.added, history.unchanged, history.deleted) if value is not None}
+
+
+def tags_for(obj) -> Set[str]:
+    table = obj.__tablename__
+    tags = {f"type:{table}"}
+    if table == "users" and obj.id is not None:
+        tags.update((f"owner:{obj.id}", f"user:{obj.id}"))
+    if table == "properties":
+        tags.update(f"owner:{owner_id}" for owner_id in _values(obj, "owner_id"))
+        if obj.id is not None:
+            tags.add(f"property:{obj.id}")
+    tags.update(f"property:{property_id}" for property_id in _values(obj, "property_id"))
+    return tags
+
+
+def _revokes_sessions(session: Session, obj) -> bool:
+    if obj.__tablename__ != "users" or obj.id is None or obj in session.new:
+        return False
+    if obj in session.deleted:
+        return True
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in SESSION_ATTRIBUTES)
+
+
+def _owner_tags(session: Session, property_ids: Iterable[int]) -> Set[str]:
+    property_ids = list(property_ids)
+    if not property_ids:
+        return set()
+    owners = session.connection().execute(
+        select(Property.owner_id).where(Property.id.in_(property_ids)).distinct()
+    ).scalars()
+    return {f"owner:{owner_id}" for owner_id in owners}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_tags(session: Session, flush_context) -> None:
+    # Pre-flush state (new/dirty/deleted and attribute history) is still visible here
+    tags: Set[str] = set()
+    changed = chain(session.new, (obj for obj in session.dirty if session.is_modified(obj)), session.deleted)
+    for obj in changed:
+        if hasattr(obj, "__tablename__"):
+            tags |= tags_for(obj)
+            if _revokes_sessions(session, obj):
+                session.info.setdefault(_PENDING_REVOCATIONS, set()).add(obj.id)
+    if not tags:
+        return
+    # Child rows only know their property; dashboards are cached per owner
+    tags |= _owner_tags(session, (int(tag.split(":")[1]) for tag in tags if tag.startswith("property:")))
+    session.info.setdefault(_PENDING_TAGS, set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    tags = session.info.pop(_PENDING_TAGS, None)
+    user_ids = session.info.pop(_PENDING_REVOCATIONS, None)
+    pending = [
+        task for task in (
+            invalidate(sorted(tags)) if tags else None,
+            _run(redis_service.delete_user_sessions, sorted(user_ids)) if user_ids else None,
+        ) if task is not None
+    ]
+    if pending:
+        # An AsyncSession awaits these before its commit() returns
+        session.info.setdefault(AFTER_COMMIT, []).extend(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tags(session: Session) -> None:
+    session.info.pop(_PENDING_TAGS, None)
+    session.info.pop(_PENDING_REVOCATIONS, None)
+
+
+def invalidate(tags: list) -> Optional[asyncio.Task]:
+    """Drop cached values carrying tags, from synchronous code.
+
+    Waits (up to cache_invalidation_timeout) so the response of a write is
+    never followed by a read of the value it replaced. On the event loop
+    thread it cannot wait, and returns the task for the caller to await.
+    """
+    return _run(redis_service.invalidate_tags, tags)
+
+
+def _run(operation, *args) -> Optional[asyncio.Task]:
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if _loop is not None and _loop.is_running():
+        if running is _loop:
+            # Committed on the loop thread itself: it cannot block on its own work
+            return _loop.create_task(operation(*args))
+        future = asyncio.run_coroutine_threadsafe(operation(*args), _loop)
+        try:
+            future.result(timeout=settings.cache_invalidation_timeout)
+        except Exception as e:
+            print(f"Cache invalidation error: {e}")
+    elif running is None:
+        # Scripts without a serving loop
+        asyncio.run(_run_detached(operation, *args))
+    else:
+        return running.create_task(operation(*args))
+    return None
+
+
+async def _run_detached(operation, *args) -> None:
+    try:
+        await operation(*args)
+    finally:
+        await redis_service.close()
@@ -0,0 +1,146 @@
+from typing import List, Dict, Any, AsyncIterator, Optional
+from datetime import datetime
+import asyncio
+import re
+import uuid
+from app.config import settings
+from app.services.ai_service import ai_service
+from app.services.redis_service import redis_service
+
+TEMPLATE_FIELDS = [
+    "tenant_name", "first_name", "monthly_rent", "lease_end_date",
+    "property_name", "property_address", "manager_name",
+]
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def _campaign_key(campaign_id: str) -> str:
+    return f"ai:campaign:{campaign_id}"
+
+
+def template_fields(tenant: Dict[str, Any], manager_name: Optional[str]) -> Dict[str, Any]:
+    full_name = tenant.get("full_name") or ""
+    return {
+        "tenant_name": full_name,
+        "first_name": full_name.split(" ")[0] if full_name else "",
+        "monthly_rent": tenant.get("monthly_rent"),
+        "lease_end_date": tenant.get("lease_end_date"),
+        "property_name": tenant.get("property_name"),
+        "property_address": tenant.get("property_address"),
+        "manager_name": manager_name or "",
+    }
+
+
+def render_template(template: str, fields: Dict[str, Any]) -> str:
+    """Fill {{field}} placeholders; unknown placeholders are left as written"""
+    def replace(match):
+        value = fields.get(match.group(1))
+        return str(value) if value is not None else match.group(0)
+
+    return _PLACEHOLDER.sub(replace, template)
+
+
+async def get_campaign(campaign_id: str) -> Optional[Dict[str, Any]]:
+    return await redis_service.get(_campaign_key(campaign_id))
+
+
+async def run_campaign(owner_id: int, manager_name: Optional[str], context: str,
+                       recipients: List[Dict[str, Any]], personalize: bool = False,
+                       use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """Generate one template per property, render it for every recipient and store the batch.
+
+    Yields a header, then one item per recipient as it becomes ready. LLM
+    calls scale with the number of properties; only personalize=True adds
+    one (bounded-concurrency) call per recipient.
+    """
+    campaign = {
+        "id": uuid.uuid4().hex,
+        "owner_id": owner_id,
+        "context": context,
+        "personalize": personalize,
+        "status": "running",
+        "created_at": datetime.utcnow().isoformat(),
+        "templates": {},
+        "messages": [],
+    }
+    by_property: Dict[int, List[Dict[str, Any]]] = {}
+    for tenant in recipients:
+        by_property.setdefault(tenant["property_id"], []).append(tenant)
+    yield {"type": "campaign", "campaign_id": campaign["id"], "recipients": len(recipients), "templates": len(by_property)}
+
+    template_slots = asyncio.Semaphore(settings.ai_batch_concurrency)
+
+    async def template_for(property_id: int) -> Dict[str, Any]:
+        tenant = by_property[property_id][0]
+        property_data = {
+            "name": tenant["property_name"],
+            "address": tenant["property_address"],
+            "city": tenant["property_city"],
+            "property_type": tenant["property_type"],
+        }
+        async with template_slots:
+            result = await ai_service.generate_communication_template(
+                property_data, context, TEMPLATE_FIELDS, use_cache=use_cache, owner_id=owner_id
+            )
+        return {"property_id": property_id, **result}
+
+    semaphore = asyncio.Semaphore(settings.ai_campaign_personalize_concurrency)
+
+    async def personalized(tenant: Dict[str, Any], message: str) -> Dict[str, Any]:
+        async with semaphore:
+            result = await ai_service.personalize_communication(
+                message, tenant, context, use_cache=use_cache, owner_id=owner_id
+            )
+        if "error" in result:
+            # The rendered template is still a complete message
+            return {"message": message, "personalized": False, "warning": result["error"]}
+        return {"message": result["message"], "personalized": True}
+
+    personalize_budget = settings.ai_campaign_max_personalized if personalize else 0
+    pending = []
+    try:
+        for finished in asyncio.as_completed([template_for(property_id) for property_id in by_property]):
+            template = await finished
+            property_id = template["property_id"]
+            campaign["templates"][str(property_id)] = template.get("template")
+            for tenant in by_property[property_id]:
+                item = {"type": "message", "tenant_id": tenant["id"], "property_id": property_id}
+                if "error" in template:
+                    item.update(status="error", error=template["error"])
+                elif personalize_budget > 0:
+                    personalize_budget -= 1
+                    message = render_template(template["template"], template_fields(tenant, manager_name))
+                    pending.append(asyncio.ensure_future(_with_item(item, personalized(tenant, message))))
+                    continue
+                else:
+                    item.update(status="success", personalized=False,
+                                message=render_template(template["template"], template_fields(tenant, manager_name)))
+                campaign["messages"].append(item)
+                yield item
+
+        for finished in asyncio.as_completed(pending):
+            item = await finished
+            campaign["messages"].append(item)
+            yield item
+    finally:
+        # A client that disconnects early must not leave personalization calls running
+        for task in pending:
+            task.cancel()
+
+    errors = sum(item["status"] == "error" for item in campaign["messages"])
+    campaign.update(
+        status="completed" if not errors else "completed_with_errors",
+        completed_at=datetime.utcnow().isoformat(),
+        summary={
+            "recipients": len(recipients),
+            "templates": len(by_property),
+            "personalized": sum(bool(item.get("personalized")) for item in campaign["messages"]),
+            "errors": errors,
+        },
+    )
+    await redis_service.set(_campaign_key(campaign["id"]), campaign, settings.ai_campaign_ttl)
+    yield {"type": "summary", "campaign_id": campaign["id"], "status": campaign["status"], **campaign["summary"]}
+
+
+async def _with_item(item: Dict[str, Any], result) -> Dict[str, Any]:
+    return {**item, "status": "success", **(await result)}
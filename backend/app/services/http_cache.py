@@ -0,0 +1,79 @@
+from typing import Any, Optional, Tuple
+from functools import lru_cache
+import hashlib
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import Select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.services.redis_service import redis_service
+
+# Bump when a response schema changes shape, so clients drop validators for the old one
+SCHEMA_VERSION = "1"
+CACHE_CONTROL = "private, no-cache"
+
+
+async def validator(db: AsyncSession, statement: Select, model, owner_id: int, *parts: Any) -> str:
+    """Weak ETag from one aggregate over the rows statement would return.
+
+    Row count catches deletes, the newest created/updated timestamp catches
+    inserts and edits, and max(id) catches a delete followed by an insert.
+    """
+    count, last_change, last_id = (await db.execute(statement.with_only_columns(
+        func.count(model.id),
+        func.max(func.coalesce(model.updated_at, model.created_at)),
+        func.max(model.id),
+    ).order_by(None))).one()
+    material = "|".join(str(part) for part in (SCHEMA_VERSION, owner_id, count, last_change, last_id, *parts))
+    return f'W/"{hashlib.sha1(material.encode()).hexdigest()[:24]}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def _body_key(request: Request, owner_id: int, etag: str) -> str:
+    return f"http:{owner_id}:{request.url.path}?{request.url.query}:{etag}"
+
+
+async def check(request: Request, response: Response, db: AsyncSession, statement: Select, model, owner_id: int,
+                *parts: Any) -> Tuple[str, Optional[Response]]:
+    """Validate a conditional GET before any rows are loaded.
+
+    Returns the ETag and, when the request can be answered without running
+    the route, a ready response: 304 for a matching If-None-Match, or the
+    cached body when the response cache is enabled.
+    """
+    etag = await validator(db, statement, model, owner_id, *parts)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return etag, Response(status_code=304, headers=headers)
+    if settings.http_response_cache_enabled:
+        body = await redis_service.get(_body_key(request, owner_id, etag))
+        if body is not None:
+            return etag, Response(content=body, media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return etag, None
+
+
+@lru_cache(maxsize=64)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+async def respond(request: Request, etag: str, owner_id: int, body: Any, schema) -> Any:
+    """Return body, also storing its serialized form when the response cache is enabled"""
+    if not settings.http_response_cache_enabled:
+        return body
+    content = _adapter(schema).dump_json(_adapter(schema).validate_python(body, from_attributes=True)).decode()
+    # The key embeds the ETag, so an entry can never be served for changed data
+    await redis_service.set(_body_key(request, owner_id, etag), content,
+                            settings.http_response_cache_ttl, [f"owner:{owner_id}"])
+    return Response(content=content, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,153 @@
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+import asyncio
+import hashlib
+import json
+import time
+from app.config import settings
+from app.database import SessionLocal
+from app.services.ai_data import portfolio_data
+from app.services.ai_service import ai_service
+from app.services.redis_service import redis_service
+
+ACTIVE_OWNERS_KEY = "ai:active_owners"
+# Activity is written at most this often per owner and process
+ACTIVITY_THROTTLE = 300.0
+
+_last_activity: Dict[int, float] = {}
+
+
+def _insights_key(owner_id: int) -> str:
+    return f"ai:insights:{owner_id}"
+
+
+def fingerprint(properties: List[Dict[str, Any]]) -> str:
+    """Hash of exactly the data the insights prompt is built from"""
+    material = json.dumps(properties, default=str, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+async def record_activity(owner_id: int) -> None:
+    """Mark an owner as recently active so off-peak runs keep their insights warm"""
+    now = time.time()
+    if now - _last_activity.get(owner_id, 0.0) < ACTIVITY_THROTTLE:
+        return
+    _last_activity[owner_id] = now
+    await redis_service.schedule(ACTIVE_OWNERS_KEY, str(owner_id), now)
+
+
+async def get_cached_insights(owner_id: int, data_fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Stored insights, if they were generated from the same portfolio data"""
+    cached = await redis_service.get(_insights_key(owner_id))
+    if cached and cached.get("fingerprint") == data_fingerprint:
+        return cached["insights"]
+    return None
+
+
+async def store_insights(owner_id: int, data_fingerprint: str, insights: Dict[str, Any]) -> bool:
+    return await redis_service.set(_insights_key(owner_id), {
+        "fingerprint": data_fingerprint,
+        "generated_at": datetime.utcnow().isoformat(),
+        "insights": insights,
+    }, settings.ai_insights_cache_ttl)
+
+
+def _parse_window(window: str) -> Tuple[dtime, dtime]:
+    start, end = window.split("-")
+    return dtime.fromisoformat(start.strip()), dtime.fromisoformat(end.strip())
+
+
+def in_off_peak(now: Optional[datetime] = None) -> bool:
+    """Whether now falls inside one of settings.ai_pregen_windows (windows may wrap midnight)"""
+    now = now or datetime.now(ZoneInfo(settings.ai_pregen_timezone))
+    current = now.time().replace(tzinfo=None)
+    for window in settings.ai_pregen_windows:
+        start, end = _parse_window(window)
+        if start <= end and start <= current < end:
+            return True
+        if start > end and (current >= start or current < end):
+            return True
+    return False
+
+
+class RateBudget:
+    """Token bucket over LLM calls, refilled at calls_per_minute"""
+
+    def __init__(self, calls_per_minute: float):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = max(calls_per_minute, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, calls: int) -> None:
+        calls = min(calls, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= calls:
+                self.tokens -= calls
+                return
+            await asyncio.sleep((calls - self.tokens) / self.rate)
+
+
+class InsightsPregenerator:
+    """Refresh stored insights for recently active owners whose portfolio data changed"""
+
+    def __init__(self):
+        self.budget = RateBudget(settings.ai_pregen_calls_per_minute)
+
+    def _load(self, owner_id: int) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return portfolio_data(db, owner_id)
+        finally:
+            db.close()
+
+    async def active_owners(self) -> List[int]:
+        since = time.time() - settings.ai_pregen_active_days * 86400
+        await redis_service.trim_before(ACTIVE_OWNERS_KEY, since)
+        return [int(owner_id) for owner_id in await redis_service.members_since(ACTIVE_OWNERS_KEY, since)]
+
+    async def run_pass(self, force: bool = False) -> Dict[str, Any]:
+        """One sweep over active owners, most recently active first; stops when the window or budget ends"""
+        stats = {"owners": 0, "generated": 0, "unchanged": 0, "failed": 0, "prompt_tokens": 0, "stopped": None}
+        token_budget = settings.ai_pregen_token_budget
+        for owner_id in await self.active_owners():
+            if not force and not in_off_peak():
+                stats["stopped"] = "window closed"
+                break
+            stats["owners"] += 1
+            properties = await asyncio.to_thread(self._load, owner_id)
+            data_fingerprint = fingerprint(properties)
+            if not properties or await get_cached_insights(owner_id, data_fingerprint) is not None:
+                stats["unchanged"] += 1
+                continue
+
+            estimate = ai_service.estimate_property_insights(properties)
+            if estimate["total_prompt_tokens"] > token_budget:
+                stats["stopped"] = "token budget exhausted"
+                break
+            token_budget -= estimate["total_prompt_tokens"]
+            await self.budget.acquire(estimate["calls"])
+
+            insights = await ai_service.generate_property_insights(properties, owner_id=owner_id)
+            if "error" in insights:
+                print(f"Insights pregeneration failed for owner {owner_id}: {insights['error']}")
+                stats["failed"] += 1
+                continue
+            await store_insights(owner_id, data_fingerprint, insights)
+            stats["generated"] += 1
+            stats["prompt_tokens"] += estimate["total_prompt_tokens"]
+        return stats
+
+    async def run_forever(self) -> None:
+        """Run a pass every ai_pregen_interval seconds while inside an off-peak window"""
+        while True:
+            if in_off_peak():
+                started = time.monotonic()
+                print(f"Insights pregeneration pass: {json.dumps(await self.run_pass())}")
+                await asyncio.sleep(max(0.0, settings.ai_pregen_interval - (time.monotonic() - started)))
+            else:
+                await asyncio.sleep(60)
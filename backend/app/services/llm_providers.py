@@ -0,0 +1,221 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import random
+import httpx
+import openai
+from app.config import settings
+
+
+class UpstreamError(Exception):
+    """A retryable failure reported by the completion backend"""
+
+
+class LLMProvider:
+    """A chat-completion backend. Results carry content plus token usage."""
+
+    name = "base"
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+                       temperature: float, timeout: float) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+                     temperature: float, timeout: float) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def close(self) -> None:
+        pass
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: str):
+        # All completions share one keep-alive connection pool
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=settings.openai_base_url or None,
+            timeout=httpx.Timeout(settings.ai_request_timeout, connect=settings.ai_connect_timeout),
+            # Retries, backoff and deadlines are handled by AIService
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.ai_max_connections,
+                    max_keepalive_connections=settings.ai_max_keepalive_connections,
+                    keepalive_expiry=settings.ai_keepalive_expiry,
+                )
+            ),
+        )
+
+    async def complete(self, model, messages, max_tokens, temperature, timeout):
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+        )
+        usage = response.usage
+        return {
+            "content": response.choices[0].message.content,
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None,
+        }
+
+    async def stream(self, model, messages, max_tokens, temperature, timeout):
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    async def close(self):
+        await self.client.close()
+
+
+def request_fingerprint(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+    material = json.dumps([model, messages, max_tokens, temperature], separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline provider with lognormal latency and token-rate distributions.
+
+    The random stream is seeded from ai_stub_seed and the request fingerprint,
+    so the same request always gets the same content and timing while a mix
+    of requests still follows the configured distributions.
+    """
+
+    name = "stub"
+
+    def __init__(self):
+        # Faults come from their own stream so a retried request can succeed
+        self._faults = random.Random(settings.ai_stub_seed)
+
+    async def _inject_fault(self, latency: float, timeout: float) -> None:
+        roll = self._faults.random()
+        if roll < settings.ai_stub_error_rate:
+            await asyncio.sleep(min(latency, timeout) / 4)
+            raise UpstreamError("stub injected upstream error (HTTP 503)")
+        if roll < settings.ai_stub_error_rate + settings.ai_stub_timeout_rate:
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError("stub injected upstream timeout")
+
+    def _plan(self, model, messages, max_tokens, temperature) -> Dict[str, Any]:
+        fingerprint = request_fingerprint(model, messages, max_tokens, temperature)
+        rng = random.Random(f"{settings.ai_stub_seed}:{fingerprint}")
+        latency = rng.lognormvariate(0, settings.ai_stub_latency_sigma) * settings.ai_stub_latency_mean
+        rate = rng.lognormvariate(0, settings.ai_stub_tokens_per_second_sigma) * settings.ai_stub_tokens_per_second_mean
+        count = min(max_tokens, settings.ai_stub_completion_tokens)
+        words = [f"w{rng.randrange(10000)}" for _ in range(max(count - 6, 0))]
+        content = json.dumps({"stub": True, "request": fingerprint[:12], "text": " ".join(words)})
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        return {
+            "latency": latency,
+            "rate": max(rate, 1.0),
+            "content": content,
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": count,
+        }
+
+    async def complete(self, model, messages, max_tokens, temperature, timeout):
+        plan = self._plan(model, messages, max_tokens, temperature)
+        await self._inject_fault(plan["latency"], timeout)
+        duration = plan["latency"] + plan["completion_tokens"] / plan["rate"]
+        if duration > timeout:
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError("stub completion exceeded timeout")
+        await asyncio.sleep(duration)
+        return {k: plan[k] for k in ("content", "prompt_tokens", "completion_tokens")}
+
+    async def stream(self, model, messages, max_tokens, temperature, timeout):
+        plan = self._plan(model, messages, max_tokens, temperature)
+        await self._inject_fault(plan["latency"], timeout)
+        await asyncio.sleep(plan["latency"])
+        words = plan["content"].split(" ")
+        per_word = plan["completion_tokens"] / plan["rate"] / max(len(words), 1)
+        for i, word in enumerate(words):
+            yield word if i == 0 else f" {word}"
+            await asyncio.sleep(per_word)
+
+
+class ReplayMiss(Exception):
+    """No recording exists for a request in replay mode"""
+
+
+class ReplayProvider(LLMProvider):
+    """Serve captured completions from ai_replay_dir; in record mode, capture from an inner provider"""
+
+    name = "replay"
+
+    def __init__(self, directory: str, record_from: Optional[LLMProvider] = None):
+        self.directory = directory
+        self.record_from = record_from
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, model, messages, max_tokens, temperature) -> str:
+        return os.path.join(self.directory, f"{request_fingerprint(model, messages, max_tokens, temperature)}.json")
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)["response"]
+
+    def _write(self, path: str, recording: Dict[str, Any]) -> None:
+        with open(path, "w") as f:
+            json.dump(recording, f, indent=2)
+
+    async def complete(self, model, messages, max_tokens, temperature, timeout):
+        # Fixture files are read and written in a worker thread, off the event loop
+        path = self._path(model, messages, max_tokens, temperature)
+        response = await asyncio.to_thread(self._read, path)
+        if response is not None:
+            return response
+        if self.record_from is None:
+            raise ReplayMiss(f"No recording for request {os.path.basename(path)}")
+
+        response = await self.record_from.complete(model, messages, max_tokens, temperature, timeout)
+        await asyncio.to_thread(self._write, path, {
+            "request": {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+            "response": response,
+        })
+        return response
+
+    async def stream(self, model, messages, max_tokens, temperature, timeout):
+        response = await self.complete(model, messages, max_tokens, temperature, timeout)
+        yield response["content"]
+
+    async def close(self):
+        if self.record_from is not None:
+            await self.record_from.close()
+
+
+def _openai_provider() -> Optional[LLMProvider]:
+    if settings.openai_api_key and settings.openai_api_key != "your_openai_api_key_here":
+        return OpenAIProvider(settings.openai_api_key)
+    return None
+
+
+def build_provider() -> Optional[LLMProvider]:
+    """Provider selected by settings.ai_provider, or None when AI is not configured"""
+    try:
+        if settings.ai_provider == "stub":
+            return StubProvider()
+        if settings.ai_provider == "replay":
+            record_from = _openai_provider() if settings.ai_replay_mode == "record" else None
+            return ReplayProvider(settings.ai_replay_dir, record_from)
+        return _openai_provider()
+    except Exception:
+        return None
@@ -0,0 +1,258 @@
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import json
+import re
+import threading
+import time
+import zlib
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.maintenance import MaintenanceRequest
+from app.services.portfolio_summary import estimate_tokens
+
+HASH_DIM = 2 ** 11
+DESCRIPTION_CHARS = 400
+OPEN_STATUSES = ("pending", "in_progress")
+# Score weights: open requests always lead, then relevance to the query, then recency
+OPEN_BONUS = 1.0
+RELEVANCE_WEIGHT = 0.6
+RECENCY_WEIGHT = 0.4
+
+_TOKEN = re.compile(r"[a-z0-9]{2,}")
+
+
+def _value(field) -> Optional[str]:
+    return field.value if hasattr(field, "value") else field
+
+
+def vectorize(text: str) -> np.ndarray:
+    """Signed feature hashing of words and word bigrams, sublinear tf, L2-normalized"""
+    words = _TOKEN.findall(text.lower())
+    counts: Dict[int, float] = {}
+    for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = zlib.crc32(term.encode())
+        bucket = h % HASH_DIM
+        counts[bucket] = counts.get(bucket, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    vector = np.zeros(HASH_DIM, dtype=np.float32)
+    if counts:
+        buckets = np.fromiter(counts.keys(), dtype=np.int64)
+        values = np.fromiter(counts.values(), dtype=np.float32)
+        vector[buckets] = np.sign(values) * (1.0 + np.log(np.maximum(np.abs(values), 1.0)))
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+    return vector
+
+
+def _record(row) -> Dict[str, Any]:
+    """Compact prompt representation of one maintenance request"""
+    description = row.description or ""
+    if len(description) > DESCRIPTION_CHARS:
+        description = description[:DESCRIPTION_CHARS].rsplit(" ", 1)[0] + "..."
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": description,
+        "status": _value(row.status),
+        "priority": _value(row.priority),
+        "estimated_cost": row.estimated_cost,
+        "actual_cost": row.actual_cost,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+class _PropertyHistory:
+    def __init__(self):
+        self.index: Dict[int, int] = {}
+        self.vectors = np.empty((0, HASH_DIM), dtype=np.float32)
+        self.created = np.empty(0)
+        self.records: List[Dict[str, Any]] = []
+        self.watermark = None
+
+    def upsert(self, rows) -> None:
+        new_rows = []
+        for row in rows:
+            i = self.index.get(row.id)
+            if i is None:
+                new_rows.append(row)
+                continue
+            self.vectors[i] = vectorize(f"{row.title} {row.description}")
+            self.created[i] = row.created_at.timestamp() if row.created_at else time.time()
+            self.records[i] = _record(row)
+        if not new_rows:
+            return
+
+        start = len(self.records)
+        for offset, row in enumerate(new_rows):
+            self.index[row.id] = start + offset
+        self.vectors = np.vstack([self.vectors, [vectorize(f"{r.title} {r.description}") for r in new_rows]])
+        self.created = np.concatenate([
+            self.created, [r.created_at.timestamp() if r.created_at else time.time() for r in new_rows]
+        ])
+        self.records.extend(_record(r) for r in new_rows)
+
+    def remove(self, request_id: int) -> None:
+        i = self.index.pop(request_id, None)
+        if i is None:
+            return
+        keep = np.ones(len(self.records), dtype=bool)
+        keep[i] = False
+        self.vectors = self.vectors[keep]
+        self.created = self.created[keep]
+        del self.records[i]
+        self.index = {record["id"]: j for j, record in enumerate(self.records)}
+
+
+class MaintenanceIndex:
+    """Per-property cosine-similarity index over maintenance history.
+
+    Histories are loaded on first use, kept for the most recently used
+    ai_maintenance_index_max_properties properties, updated in place by the
+    maintenance router and re-synced from the database by watermark so
+    changes made in other worker processes are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._properties: "OrderedDict[int, _PropertyHistory]" = OrderedDict()
+
+    def _query(self, db: Session, property_id: int):
+        return db.query(MaintenanceRequest).filter(MaintenanceRequest.property_id == property_id)
+
+    def _sync(self, db: Session, property_id: int) -> _PropertyHistory:
+        """Bring a property's history up to date.
+
+        Queries run before the lock is taken; it is only held while the
+        in-memory history is swapped or updated, so a router thread (or the
+        event loop) applying a write never waits on another thread's query.
+        """
+        changed_at = func.coalesce(MaintenanceRequest.updated_at, MaintenanceRequest.created_at)
+        count, watermark = db.query(func.count(MaintenanceRequest.id), func.max(changed_at)).filter(
+            MaintenanceRequest.property_id == property_id
+        ).one()
+        with self._lock:
+            history = self._properties.get(property_id)
+            since = history.watermark if history is not None else None
+            size = len(history.index) if history is not None else 0
+
+        fresh = rows = None
+        if history is None or count < size:
+            fresh = self._load(db, property_id)
+        elif watermark is not None and (since is None or watermark > since or count != size):
+            query = self._query(db, property_id)
+            if since is not None:
+                # >=: rows committed with the same timestamp as the last watermark; upsert dedupes by id
+                query = query.filter(changed_at >= since)
+            rows = query.all()
+
+        with self._lock:
+            history = self._properties.get(property_id)
+            if fresh is None and history is not None:
+                if rows:
+                    history.upsert(rows)
+                if len(history.index) == count:
+                    history.watermark = watermark or history.watermark
+                    return self._install(property_id, history)
+        if fresh is None:
+            # Evicted meanwhile, or rows were deleted as well as added since the last sync
+            fresh = self._load(db, property_id)
+        with self._lock:
+            return self._install(property_id, fresh)
+
+    def _load(self, db: Session, property_id: int) -> _PropertyHistory:
+        history = _PropertyHistory()
+        rows = self._query(db, property_id).all()
+        history.upsert(rows)
+        history.watermark = max(filter(None, (row.updated_at or row.created_at for row in rows)), default=None)
+        return history
+
+    def _install(self, property_id: int, history: _PropertyHistory) -> _PropertyHistory:
+        self._properties[property_id] = history
+        self._properties.move_to_end(property_id)
+        while len(self._properties) > settings.ai_maintenance_index_max_properties:
+            self._properties.popitem(last=False)
+        return history
+
+    def upsert(self, request: MaintenanceRequest) -> None:
+        """Apply a created or updated request to an already-loaded property history"""
+        with self._lock:
+            history = self._properties.get(request.property_id)
+            if history is not None:
+                history.upsert([request])
+
+    def remove(self, property_id: int, request_id: int) -> None:
+        with self._lock:
+            history = self._properties.get(property_id)
+            if history is not None:
+                history.remove(request_id)
+
+    def select(self, db: Session, property_id: int, query: Optional[str] = None) -> Dict[str, Any]:
+        """Most relevant and recent records for the prompt, near-duplicates collapsed, within the token budget"""
+        history = self._sync(db, property_id)
+        with self._lock:
+            if not history.records:
+                return {"records": [], "summary": {"total_requests": 0}}
+
+            status = np.array([record["status"] for record in history.records], dtype=object)
+            is_open = np.isin(status, OPEN_STATUSES)
+            if query:
+                goal = vectorize(query)
+            elif is_open.any():
+                # With no explicit focus, rank history by similarity to what is open now
+                goal = history.vectors[is_open].sum(axis=0)
+            else:
+                goal = history.vectors[np.argsort(-history.created)[:5]].sum(axis=0)
+            norm = np.linalg.norm(goal)
+            relevance = history.vectors @ (goal / norm) if norm else np.zeros(len(history.records))
+
+            age_days = np.maximum(time.time() - history.created, 0.0) / 86400
+            recency = 0.5 ** (age_days / settings.ai_maintenance_recency_half_life_days)
+            score = RELEVANCE_WEIGHT * relevance + RECENCY_WEIGHT * recency + OPEN_BONUS * is_open
+            order = np.lexsort((-history.created, -score))
+
+            selected: List[int] = []
+            similar: Dict[int, int] = {}
+            # Similarity of every record to its closest already-selected record
+            closest = np.full(len(history.records), -np.inf, dtype=np.float32)
+            closest_to = np.zeros(len(history.records), dtype=np.int64)
+            budget = settings.ai_maintenance_context_tokens
+            for i in order:
+                if closest[i] >= settings.ai_maintenance_duplicate_threshold:
+                    similar[int(closest_to[i])] = similar.get(int(closest_to[i]), 0) + 1
+                    continue
+                if len(selected) >= settings.ai_maintenance_context_k:
+                    break
+                cost = estimate_tokens(json.dumps(history.records[i], default=str))
+                if cost > budget:
+                    continue
+                budget -= cost
+                selected.append(int(i))
+                overlap = history.vectors @ history.vectors[i]
+                nearer = overlap > closest
+                closest[nearer] = overlap[nearer]
+                closest_to[nearer] = i
+
+            records = []
+            for i in sorted(selected, key=lambda j: history.created[j]):
+                record = dict(history.records[i])
+                if similar.get(i):
+                    record["similar_requests"] = similar[i]
+                records.append(record)
+
+            priority = [record["priority"] for record in history.records]
+            summary = {
+                "total_requests": len(history.records),
+                "open_requests": int(is_open.sum()),
+                "by_status": {s: int((status == s).sum()) for s in sorted(set(status) - {None})},
+                "by_priority": {p: priority.count(p) for p in sorted(set(priority) - {None})},
+                "first_request": history.records[int(np.argmin(history.created))]["created_at"],
+                "last_request": history.records[int(np.argmax(history.created))]["created_at"],
+                "records_included": len(records),
+            }
+        return {"records": records, "summary": summary}
+
+
+# Global instance
+maintenance_index = MaintenanceIndex()
@@ -0,0 +1,185 @@
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import json
+import os
+import re
+import threading
+import time
+import zlib
+import numpy as np
+from app.config import settings
+
+HASH_DIM = 2 ** 14
+PRIORITIES = ("low", "medium", "high", "urgent")
+
+# There is no category column, so training rows are labelled by keyword and the
+# classifier learns the surrounding vocabulary from them.
+CATEGORY_KEYWORDS = {
+    "plumbing": ("leak", "leaking", "faucet", "toilet", "drain", "pipe", "clog", "clogged", "sink",
+                 "shower", "water heater", "sewer", "flood", "flooding"),
+    "electrical": ("outlet", "breaker", "electrical", "wiring", "power", "sparking", "switch", "fuse"),
+    "hvac": ("hvac", "furnace", "heat", "heating", "no heat", "air conditioning", "ac", "thermostat",
+             "cooling", "vent"),
+    "appliance": ("dishwasher", "fridge", "refrigerator", "oven", "stove", "washer", "dryer",
+                  "microwave", "disposal"),
+    "pest": ("pest", "ants", "roach", "roaches", "mice", "mouse", "rats", "bugs", "termite", "termites"),
+    "structural": ("roof", "wall", "ceiling", "floor", "foundation", "window", "stairs", "crack", "mold"),
+    "safety": ("smoke detector", "carbon monoxide", "gas leak", "gas smell", "fire", "lock", "locked out",
+               "security", "alarm"),
+}
+DEFAULT_CATEGORY = "general"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def hashed_terms(text: str) -> np.ndarray:
+    """Distinct hashed unigram and bigram buckets of text"""
+    words = _words(text)
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return np.unique(np.fromiter((zlib.crc32(t.encode()) % HASH_DIM for t in terms), dtype=np.int64, count=len(terms)))
+
+
+def keyword_category(text: str) -> str:
+    """Category with the most keyword hits in text"""
+    padded = f" {' '.join(_words(text))} "
+    hits = {
+        category: sum(f" {keyword} " in padded for keyword in keywords)
+        for category, keywords in CATEGORY_KEYWORDS.items()
+    }
+    best = max(hits, key=hits.get)
+    return best if hits[best] else DEFAULT_CATEGORY
+
+
+class _NaiveBayes:
+    """Multinomial naive Bayes over binarized hashed terms"""
+
+    def __init__(self, classes: Sequence[str], log_prior: np.ndarray, log_likelihood: np.ndarray):
+        self.classes = list(classes)
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood
+
+    @classmethod
+    def fit(cls, docs: List[np.ndarray], labels: List[str], alpha: float) -> "_NaiveBayes":
+        classes = sorted(set(labels))
+        label_index = np.array([classes.index(label) for label in labels])
+        counts = np.zeros((len(classes), HASH_DIM))
+        for terms, c in zip(docs, label_index):
+            counts[c, terms] += 1
+        class_counts = np.bincount(label_index, minlength=len(classes))
+        log_prior = np.log(class_counts / class_counts.sum())
+        smoothed = counts + alpha
+        log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        return cls(classes, log_prior.astype(np.float32), log_likelihood.astype(np.float32))
+
+    def predict(self, terms: np.ndarray) -> Tuple[str, float]:
+        scores = self.log_prior + self.log_likelihood[:, terms].sum(axis=1)
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        best = int(np.argmax(probabilities))
+        return self.classes[best], float(probabilities[best])
+
+
+class TriageModel:
+    """Priority and category heads trained from historical maintenance requests"""
+
+    def __init__(self, priority: _NaiveBayes, category: _NaiveBayes, meta: Dict[str, Any]):
+        self.priority = priority
+        self.category = category
+        self.meta = meta
+
+    @classmethod
+    def train(cls, rows: List[Tuple[str, str, str]], alpha: float = 0.5) -> "TriageModel":
+        """rows are (title, description, priority)"""
+        docs = [hashed_terms(f"{title} {description}") for title, description, _ in rows]
+        categories = [keyword_category(f"{title} {description}") for title, description, _ in rows]
+        meta = {
+            "samples": len(rows),
+            "alpha": alpha,
+            "hash_dim": HASH_DIM,
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        return cls(
+            _NaiveBayes.fit(docs, [priority for _, _, priority in rows], alpha),
+            _NaiveBayes.fit(docs, categories, alpha),
+            meta,
+        )
+
+    def predict(self, title: str, description: str) -> Dict[str, Any]:
+        terms = hashed_terms(f"{title} {description}")
+        priority, priority_confidence = self.priority.predict(terms)
+        category, category_confidence = self.category.predict(terms)
+        return {
+            "priority": priority,
+            "priority_confidence": round(priority_confidence, 3),
+            "category": category,
+            "category_confidence": round(category_confidence, 3),
+        }
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write then rename so serving processes never load a half-written file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            meta=json.dumps(self.meta),
+            priority_classes=np.array(self.priority.classes),
+            priority_log_prior=self.priority.log_prior,
+            priority_log_likelihood=self.priority.log_likelihood,
+            category_classes=np.array(self.category.classes),
+            category_log_prior=self.category.log_prior,
+            category_log_likelihood=self.category.log_likelihood,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TriageModel":
+        with np.load(path) as data:
+            return cls(
+                _NaiveBayes(data["priority_classes"].tolist(), data["priority_log_prior"],
+                            data["priority_log_likelihood"]),
+                _NaiveBayes(data["category_classes"].tolist(), data["category_log_prior"],
+                            data["category_log_likelihood"]),
+                json.loads(str(data["meta"])),
+            )
+
+
+class MaintenanceTriage:
+    """Lazily loaded triage model, reloaded when the model file is replaced"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model: Optional[TriageModel] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = float("-inf")
+
+    def _current(self) -> Optional[TriageModel]:
+        if time.monotonic() - self._checked_at < settings.ai_triage_reload_interval:
+            return self._model
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return self._model
+            if mtime != self._mtime:
+                try:
+                    self._model = TriageModel.load(self.path)
+                    self._mtime = mtime
+                except Exception as e:
+                    print(f"Triage model load error: {e}")
+        return self._model
+
+    def suggest(self, title: str, description: str) -> Optional[Dict[str, Any]]:
+        """Suggested priority and category, or None when no model has been trained"""
+        if not settings.ai_triage_enabled:
+            return None
+        model = self._current()
+        return model.predict(title, description) if model else None
+
+
+# Global instance
+maintenance_triage = MaintenanceTriage(settings.ai_triage_model_path)
@@ -0,0 +1,103 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import time
+from app.config import settings
+from app.metrics import Counter, Gauge
+
+# Rough per-entry bookkeeping cost on top of key and value bytes
+ENTRY_OVERHEAD = 120
+
+cache_lookups = Counter("cache_lookups_total", "Cache lookups by tier and result", ["tier", "result"])
+cache_evictions = Counter("cache_evictions_total", "Near-cache entries dropped, by reason", ["tier", "reason"])
+near_cache_bytes = Gauge("cache_near_bytes", "Approximate bytes held by the in-process near cache")
+near_cache_entries = Gauge("cache_near_entries", "Entries held by the in-process near cache")
+
+
+class NearCache:
+    """Size-bounded LRU of encoded values with per-entry TTL, kept in front of Redis.
+
+    Only keys whose prefix appears in settings.near_cache_ttls are held, for
+    at most that many seconds. Entries are dropped on pub/sub invalidation;
+    `generation` moves on every invalidation so a Redis read that raced one
+    is not stored.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttls: Dict[str, float]):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.generation = 0
+        self._entries: "OrderedDict[str, Tuple[float, int, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def ttl_for(self, key: str) -> Optional[float]:
+        """Local TTL for key, or None if it is not near-cached"""
+        if not settings.near_cache_enabled:
+            return None
+        for prefix, ttl in self.ttls.items():
+            if key.startswith(prefix):
+                return ttl
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._drop(key, "expired")
+            entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            cache_lookups.inc(tier="near", result="miss")
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        cache_lookups.inc(tier="near", result="hit")
+        return entry[2]
+
+    def put(self, key: str, raw: bytes, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        size = len(key) + len(raw) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key, None)
+        self._entries[key] = (time.monotonic() + ttl, size, raw)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)), "lru")
+        self._report()
+
+    def invalidate(self, key: str) -> None:
+        self.generation += 1
+        if key in self._entries:
+            self._drop(key, "invalidated")
+            self._report()
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._report()
+
+    def _drop(self, key: str, reason: Optional[str]) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        if reason is None:
+            return
+        stat = {"lru": "evictions", "expired": "expirations", "invalidated": "invalidations"}[reason]
+        self.stats[stat] += 1
+        cache_evictions.inc(tier="near", reason=reason)
+
+    def _report(self) -> None:
+        near_cache_bytes.set(self._bytes)
+        near_cache_entries.set(len(self._entries))
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,122 @@
+from typing import Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import asyncio
+import multiprocessing
+import os
+import time
+from passlib.context import CryptContext
+from app.config import settings
+from app.metrics import Counter, Gauge, Histogram
+
+AUTH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+LOGIN_QUANTILES = (0.5, 0.95, 0.99)
+
+auth_hash_seconds = Histogram(
+    "auth_password_seconds", "Password hash/verify time including queueing", ["operation"], AUTH_BUCKETS
+)
+auth_login_seconds = Histogram("auth_login_seconds", "Login request duration", ["outcome"], AUTH_BUCKETS)
+auth_login_latency = Gauge("auth_login_latency_seconds", "Login duration percentiles (bucket upper bounds)", ["quantile"])
+auth_hash_pending = Gauge("auth_hash_pending", "Password operations queued or running in the hasher pool")
+auth_hash_rejections = Counter("auth_hash_rejections_total", "Password operations shed because the pool was full")
+
+
+class HasherSaturated(Exception):
+    """More password operations are queued than auth_hash_max_pending allows"""
+
+
+@lru_cache(maxsize=4)
+def password_context(rounds: int) -> CryptContext:
+    """bcrypt context at a fixed cost; hashes at any other cost report needs_update"""
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds,
+    )
+
+
+# Run inside the pool's worker processes
+def _hash(password: str, rounds: int) -> str:
+    return password_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return password_context(rounds).verify_and_update(password, hashed_password)
+
+
+def _init_worker(niceness: int) -> None:
+    # Lower priority so request handling wins the CPU when cores are contended
+    if niceness:
+        os.nice(niceness)
+    _warm_up()
+
+
+def _warm_up() -> None:
+    # Loads the bcrypt backend before the first real request lands on this worker
+    password_context(4).hash("warm-up")
+
+
+class PasswordHasher:
+    """bcrypt on a dedicated process pool, off the event loop and the request threadpool.
+
+    Callers beyond auth_hash_max_pending get HasherSaturated at once instead
+    of queueing behind a login burst.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs threads and an event loop is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.auth_hash_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.auth_hash_niceness,),
+            )
+        return self._pool
+
+    async def _run(self, operation: str, fn, *args):
+        if self.pending >= settings.auth_hash_max_pending:
+            auth_hash_rejections.inc()
+            raise HasherSaturated()
+        self.pending += 1
+        auth_hash_pending.set(self.pending)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        finally:
+            self.pending -= 1
+            auth_hash_pending.set(self.pending)
+            auth_hash_seconds.observe(time.perf_counter() - started, operation=operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password, settings.auth_bcrypt_rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash) where a new hash is returned when the stored one uses other parameters"""
+        return await self._run("verify", _verify_and_update, password, hashed_password, settings.auth_bcrypt_rounds)
+
+    def start(self) -> None:
+        """Spawn the workers ahead of the first login"""
+        for _ in range(settings.auth_hash_workers):
+            self.pool.submit(_warm_up)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def record_login(outcome: str, duration: float) -> None:
+    auth_login_seconds.observe(duration, outcome=outcome)
+    for q in LOGIN_QUANTILES:
+        value = auth_login_seconds.quantile(q, outcome="success")
+        if value is not None:
+            auth_login_latency.set(value, quantile=str(q))
+
+
+# Global instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,145 @@
+from typing import List, Dict, Any, Optional
+import json
+import math
+import numpy as np
+from app.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # optional; fall back to a character heuristic
+    tiktoken = None
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate prompt tokens (exact when tiktoken is installed)"""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def _column(properties: List[Dict[str, Any]], field: str) -> np.ndarray:
+    return np.array([p.get(field) if p.get(field) is not None else np.nan for p in properties], dtype=float)
+
+
+def _group_stats(labels: np.ndarray, rent: np.ndarray, ppsf: np.ndarray, vacant: np.ndarray,
+                 limit: int = 15) -> Dict[str, Dict[str, Any]]:
+    """Count, mean rent, mean rent/sqft and vacancy for the `limit` largest labels, via bincount"""
+    keys, index = np.unique(labels, return_inverse=True)
+    counts = np.bincount(index)
+    rent_mean = np.bincount(index, weights=rent) / counts
+    has_ppsf = ~np.isnan(ppsf)
+    ppsf_counts = np.bincount(index, weights=has_ppsf.astype(float), minlength=len(keys))
+    ppsf_sums = np.bincount(index, weights=np.where(has_ppsf, ppsf, 0.0), minlength=len(keys))
+    vacancy = np.bincount(index, weights=vacant.astype(float)) / counts
+
+    stats = {}
+    for i in np.argsort(-counts, kind="stable")[:limit]:
+        stats[str(keys[i])] = {
+            "properties": int(counts[i]),
+            "avg_rent": round(float(rent_mean[i]), 2),
+            "avg_rent_per_sqft": round(float(ppsf_sums[i] / ppsf_counts[i]), 3) if ppsf_counts[i] else None,
+            "vacancy_rate": round(float(vacancy[i]), 3),
+        }
+    return stats
+
+
+def aggregate_portfolio(properties: List[Dict[str, Any]], max_outliers: int = 10) -> Dict[str, Any]:
+    """Vectorized portfolio statistics: rent/sqft by city and type, vacancy and rent outliers"""
+    if not properties:
+        return {"properties": 0}
+
+    rent = _column(properties, "rent_amount")
+    sqft = _column(properties, "square_feet")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ppsf = np.where(sqft > 0, rent / sqft, np.nan)
+    active = np.array([bool(p.get("is_active", True)) for p in properties])
+    tenants = _column(properties, "active_tenants")
+    vacant = active & (np.nan_to_num(tenants) == 0) if not np.isnan(tenants).all() else np.zeros(len(properties), dtype=bool)
+    cities = np.array([f"{p.get('city')}, {p.get('state')}" for p in properties])
+    types = np.array([str(p.get("property_type")) for p in properties])
+
+    # Robust z-score on rent/sqft (median and MAD) to flag mispriced units
+    outliers = []
+    valid = ~np.isnan(ppsf)
+    if valid.sum() >= 5:
+        median = np.median(ppsf[valid])
+        mad = np.median(np.abs(ppsf[valid] - median)) or 1e-9
+        z = np.where(valid, 0.6745 * (ppsf - median) / mad, 0.0)
+        for i in np.argsort(-np.abs(z))[:max_outliers]:
+            if abs(z[i]) < 3.5:
+                break
+            outliers.append({
+                "id": properties[i].get("id"),
+                "name": properties[i].get("name"),
+                "city": properties[i].get("city"),
+                "property_type": properties[i].get("property_type"),
+                "rent_amount": float(rent[i]),
+                "rent_per_sqft": round(float(ppsf[i]), 3),
+                "z_score": round(float(z[i]), 2),
+            })
+
+    return {
+        "properties": len(properties),
+        "active_properties": int(active.sum()),
+        "vacancy_rate": round(float(vacant.sum() / max(active.sum(), 1)), 3),
+        "total_monthly_rent": round(float(np.nansum(np.where(active, rent, 0.0))), 2),
+        "median_rent": round(float(np.nanmedian(rent)), 2),
+        "median_rent_per_sqft": round(float(np.nanmedian(ppsf)), 3) if valid.any() else None,
+        "by_city": _group_stats(cities, rent, ppsf, vacant),
+        "by_type": _group_stats(types, rent, ppsf, vacant),
+        "rent_outliers": outliers,
+    }
+
+
+def _compact_rows(properties: List[Dict[str, Any]]) -> str:
+    """Properties as a header + CSV rows, far fewer tokens than repeated JSON keys"""
+    fields = ["id", "name", "city", "state", "property_type", "bedrooms", "bathrooms",
+              "square_feet", "rent_amount", "is_active", "active_tenants"]
+    lines = [",".join(fields)]
+    for p in properties:
+        lines.append(",".join("" if p.get(f) is None else str(p.get(f)).replace(",", " ") for f in fields))
+    return "\n".join(lines)
+
+
+def _chunks(properties: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Split a large portfolio by city, merging the smallest cities so at most ai_portfolio_max_chunks remain"""
+    by_city: Dict[str, List[Dict[str, Any]]] = {}
+    for p in properties:
+        by_city.setdefault(f"{p.get('city')}, {p.get('state')}", []).append(p)
+    groups = sorted(by_city.values(), key=len, reverse=True)
+    max_chunks = max(1, settings.ai_portfolio_max_chunks)
+    if len(groups) > max_chunks:
+        merged = [p for group in groups[max_chunks - 1:] for p in group]
+        groups = groups[:max_chunks - 1] + [merged]
+    return groups
+
+
+def plan_insights(properties: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Decide how to prompt for a portfolio and pre-render every prompt body.
+
+    Small portfolios go out as one prompt with stats plus compact rows. Above
+    ai_portfolio_map_reduce_threshold, raw rows are dropped: each chunk prompt
+    carries only that chunk's aggregates and outliers, so the number and size
+    of prompts are bounded by ai_portfolio_max_chunks, not by property count.
+    """
+    stats = aggregate_portfolio(properties)
+    if len(properties) <= settings.ai_portfolio_map_reduce_threshold:
+        return {
+            "mode": "direct",
+            "stats": stats,
+            "body": f"Portfolio statistics: {json.dumps(stats)}\n\nProperties (CSV):\n{_compact_rows(properties)}",
+            "chunks": [],
+        }
+
+    chunks = []
+    for group in _chunks(properties):
+        chunk_stats = aggregate_portfolio(group, max_outliers=settings.ai_portfolio_outliers_per_chunk)
+        chunks.append(f"Segment statistics: {json.dumps(chunk_stats)}")
+    overall = {k: v for k, v in stats.items() if k != "by_city"}
+    return {"mode": "map_reduce", "stats": stats, "body": f"Portfolio statistics: {json.dumps(overall)}", "chunks": chunks}
+
@@ -1,36 +1,291 @@
-import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
-from typing import Any, Optional, Dict
+import time
+import uuid
+from typing import Any, Optional, Dict, List, Set, Tuple
 from app.config import settings
+from app.services import cache_codec
+from app.services.near_cache import NearCache, cache_lookups
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# KEYS: processing list, queue. Moves everything back to the consuming end of the queue.
+REQUEUE_SCRIPT = """
+local moved = 0
+while redis.call("lmove", KEYS[1], KEYS[2], "RIGHT", "RIGHT") do
+    moved = moved + 1
+end
+return moved
+"""
+
+# KEYS: user session hash; ARGV: session id, presented token hash, new token hash, now, idle ttl,
+# reuse grace. Returns {1, subject} after rotating, {-1} when the token rotated out more than the
+# grace ago comes back (the session is ended), {0} for anything else, leaving the session alone.
+ROTATE_SESSION_SCRIPT = """
+local sid = ARGV[1]
+local now = tonumber(ARGV[4])
+local token = redis.call("hget", KEYS[1], sid .. ":token")
+if not token then
+    return {0}
+end
+if tonumber(redis.call("hget", KEYS[1], sid .. ":exp") or "0") < now then
+    redis.call("hdel", KEYS[1], sid .. ":token", sid .. ":sub", sid .. ":exp", sid .. ":meta",
+               sid .. ":prev", sid .. ":rotated")
+    return {0}
+end
+if token ~= ARGV[2] then
+    local rotated = tonumber(redis.call("hget", KEYS[1], sid .. ":rotated") or "0")
+    if ARGV[2] == redis.call("hget", KEYS[1], sid .. ":prev") and now - rotated > tonumber(ARGV[6]) then
+        -- The rotated-out token came back well after its successor was issued: someone replayed it
+        redis.call("hdel", KEYS[1], sid .. ":token", sid .. ":sub", sid .. ":exp", sid .. ":meta",
+                   sid .. ":prev", sid .. ":rotated")
+        return {-1}
+    end
+    -- A concurrent refresh of the same token, or a guess: refuse without touching the session
+    return {0}
+end
+redis.call("hset", KEYS[1], sid .. ":token", ARGV[3], sid .. ":prev", token, sid .. ":rotated", ARGV[4])
+redis.call("expire", KEYS[1], ARGV[5])
+return {1, redis.call("hget", KEYS[1], sid .. ":sub")}
+"""
+
+# KEYS: key, n tag sets, n tag versions; ARGV: value, expire, tag ttl, n, expected versions ("" = any)
+SET_TAGGED_SCRIPT = """
+local n = tonumber(ARGV[4])
+for i = 1, n do
+    local expected = ARGV[4 + i]
+    if expected ~= "" and (redis.call("get", KEYS[1 + n + i]) or "0") ~= expected then
+        return 0
+    end
+end
+redis.call("setex", KEYS[1], ARGV[2], ARGV[1])
+for i = 1, n do
+    redis.call("sadd", KEYS[1 + i], KEYS[1])
+    redis.call("expire", KEYS[1 + i], ARGV[3])
+end
+return 1
+"""
+
+# KEYS: n tag sets, n tag versions; ARGV: version ttl. Returns the dropped keys.
+INVALIDATE_TAGS_SCRIPT = """
+local n = #KEYS / 2
+local dropped = {}
+for i = 1, n do
+    for _, key in ipairs(redis.call("smembers", KEYS[i])) do
+        redis.call("del", key)
+        dropped[#dropped + 1] = key
+    end
+    redis.call("del", KEYS[i])
+    redis.call("incr", KEYS[n + i])
+    redis.call("expire", KEYS[n + i], ARGV[1])
+end
+return dropped
+"""
+
 
 class RedisService:
     def __init__(self):
-        self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+        # Clients are created on first use, inside the event loop that uses them
+        self._client: Optional[aioredis.Redis] = None
+        self._blocking_client: Optional[aioredis.Redis] = None
+        self._value_client: Optional[aioredis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.near_cache = NearCache(settings.near_cache_max_entries, settings.near_cache_max_bytes, settings.near_cache_ttls)
+        # Tags this process's invalidations so its own listener can skip them
+        self.origin = uuid.uuid4().hex
+        # The near cache is only served while the invalidation listener is subscribed
+        self._near_active = False
+        self._listener: Optional[asyncio.Task] = None
+        # One pub/sub connection per process serves every wait_for_message, fanned out by channel
+        self._subscriber = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._subscribing: Optional[asyncio.Lock] = None
+
+    def _new_client(self, blocking: bool = False, decode_responses: bool = True) -> aioredis.Redis:
+        pool = aioredis.ConnectionPool.from_url(
+            settings.redis_url,
+            decode_responses=decode_responses,
+            max_connections=settings.redis_blocking_max_connections if blocking else settings.redis_max_connections,
+            # BRPOP and pub/sub waits legitimately outlast the normal read timeout
+            socket_timeout=None if blocking else settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
+            socket_keepalive=True,
+            health_check_interval=settings.redis_health_check_interval,
+            retry_on_timeout=settings.redis_retry_on_timeout,
+        )
+        return aioredis.Redis(connection_pool=pool)
+
+    def _bind(self) -> None:
+        # Pooled connections belong to one event loop; a new loop (asyncio.run in
+        # scripts, test clients) gets fresh pools instead of unusable connections.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._client = self._new_client()
+            self._blocking_client = self._new_client(blocking=True)
+            self._value_client = self._new_client(decode_responses=False)
+            self._loop = loop
+            self._near_active = False
+            self.near_cache.clear()
+            self._subscriber = self._dispatcher = None
+            self._waiters = {}
+            self._subscribing = asyncio.Lock()
+
+    @property
+    def redis_client(self) -> aioredis.Redis:
+        self._bind()
+        return self._client
+
+    @property
+    def blocking_client(self) -> aioredis.Redis:
+        self._bind()
+        return self._blocking_client
+
+    @property
+    def value_client(self) -> aioredis.Redis:
+        """Client for codec-encoded values, which are binary"""
+        self._bind()
+        return self._value_client
+
+    async def close(self) -> None:
+        """Stop the invalidation listener and disconnect all pools"""
+        await self.stop_invalidation_listener()
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except (asyncio.CancelledError, Exception):
+                pass
+        for client in (self._client, self._blocking_client, self._value_client):
+            if client is not None:
+                await client.aclose()
+        self._client = self._blocking_client = self._value_client = self._loop = None
+
+    async def ping(self) -> bool:
+        try:
+            return bool(await self.redis_client.ping())
+        except Exception as e:
+            print(f"Redis ping error: {e}")
+            return False
+    
+    def _local_ttl(self, key: str) -> Optional[float]:
+        return self.near_cache.ttl_for(key) if self._near_active else None
     
     async def get(self, key: str) -> Optional[Any]:
-        """Get value from Redis"""
+        """Get value from the near cache, else from Redis"""
+        local_ttl = self._local_ttl(key)
+        if local_ttl:
+            raw = self.near_cache.get(key)
+            if raw is not None:
+                return cache_codec.decode(raw)
         try:
-            value = self.redis_client.get(key)
+            if local_ttl:
+                generation = self.near_cache.generation
+                async with self.value_client.pipeline(transaction=False) as pipe:
+                    pipe.get(key)
+                    pipe.pttl(key)
+                    value, pttl = await pipe.execute()
+                self._fill(key, value, pttl, local_ttl, generation)
+            else:
+                value = await self.value_client.get(key)
+            cache_lookups.inc(tier="redis", result="hit" if value else "miss")
             if value:
-                return json.loads(value)
+                return cache_codec.decode(value)
             return None
         except Exception as e:
             print(f"Redis get error: {e}")
             return None
     
-    async def set(self, key: str, value: Any, expire: int = 3600) -> bool:
-        """Set value in Redis with expiration"""
+    def _fill(self, key: str, value: Optional[bytes], pttl: int, local_ttl: float, generation: int) -> None:
+        # Never hold a key longer than Redis will, nor one invalidated while it was being read
+        if value and generation == self.near_cache.generation:
+            self.near_cache.put(key, value, min(local_ttl, pttl / 1000) if pttl > 0 else local_ttl)
+    
+    def _invalidation(self, keys: List[str]) -> str:
+        return json.dumps({"origin": self.origin, "keys": keys})
+    
+    async def set(self, key: str, value: Any, expire: int = 3600, tags: Optional[List[str]] = None,
+                  versions: Optional[List[str]] = None) -> bool:
+        """Set value in Redis with expiration.
+
+        Tagged values are dropped by invalidate_tags(); with versions (from
+        tag_versions()) the write is skipped if any tag was invalidated since.
+        """
         try:
-            serialized_value = json.dumps(value, default=str)
-            return self.redis_client.setex(key, expire, serialized_value)
+            serialized_value = cache_codec.encode(value)
+            near = bool(self.near_cache.ttl_for(key))
+            if not near and not tags:
+                return bool(await self.value_client.setex(key, expire, serialized_value))
+            if near:
+                self.near_cache.invalidate(key)
+            async with self.value_client.pipeline(transaction=False) as pipe:
+                if tags:
+                    tag_sets, tag_versions = self._tag_keys(tags)
+                    pipe.eval(
+                        SET_TAGGED_SCRIPT, 1 + 2 * len(tags), key, *tag_sets, *tag_versions,
+                        serialized_value, expire, max(expire, settings.cache_tag_ttl), len(tags),
+                        *(versions or [""] * len(tags)),
+                    )
+                else:
+                    pipe.setex(key, expire, serialized_value)
+                if near:
+                    pipe.publish(settings.near_cache_channel, self._invalidation([key]))
+                stored = (await pipe.execute())[0]
+            local_ttl = self._local_ttl(key)
+            if stored and local_ttl:
+                self.near_cache.put(key, serialized_value, min(local_ttl, expire))
+            return bool(stored)
         except Exception as e:
             print(f"Redis set error: {e}")
             return False
     
+    def _tag_keys(self, tags: List[str]):
+        return [f"tag:{tag}" for tag in tags], [f"tag:{tag}:version" for tag in tags]
+    
+    async def tag_versions(self, tags: List[str]) -> Optional[List[str]]:
+        """Snapshot of tag versions, taken before reading the data a tagged value is built from"""
+        try:
+            return [version or "0" for version in await self.redis_client.mget(self._tag_keys(tags)[1])]
+        except Exception as e:
+            print(f"Redis tag_versions error: {e}")
+            return None
+    
+    async def invalidate_tags(self, tags: List[str]) -> int:
+        """Drop every value carrying any of tags, here and in every worker's near cache"""
+        if not tags:
+            return 0
+        try:
+            tag_sets, tag_versions = self._tag_keys(tags)
+            dropped = await self.redis_client.eval(
+                INVALIDATE_TAGS_SCRIPT, 2 * len(tags), *tag_sets, *tag_versions, settings.cache_tag_ttl
+            )
+            near_keys = [key for key in dropped if self.near_cache.ttl_for(key)]
+            for key in near_keys:
+                self.near_cache.invalidate(key)
+            if near_keys:
+                await self.redis_client.publish(settings.near_cache_channel, self._invalidation(near_keys))
+            return len(dropped)
+        except Exception as e:
+            print(f"Redis invalidate_tags error: {e}")
+            return 0
+    
     async def delete(self, key: str) -> bool:
         """Delete key from Redis"""
         try:
-            return bool(self.redis_client.delete(key))
+            if not self.near_cache.ttl_for(key):
+                return bool(await self.redis_client.delete(key))
+            self.near_cache.invalidate(key)
+            async with self.pipeline() as pipe:
+                pipe.delete(key)
+                pipe.publish(settings.near_cache_channel, self._invalidation([key]))
+                deleted, _ = await pipe.execute()
+            return bool(deleted)
         except Exception as e:
             print(f"Redis delete error: {e}")
             return False
@@ -38,34 +293,449 @@ class RedisService:
     async def exists(self, key: str) -> bool:
         """Check if key exists in Redis"""
         try:
-            return bool(self.redis_client.exists(key))
+            return bool(await self.redis_client.exists(key))
         except Exception as e:
             print(f"Redis exists error: {e}")
             return False
     
-    async def get_user_session(self, user_id: int) -> Optional[Dict[str, Any]]:
-        """Get user session data"""
-        return await self.get(f"session:user:{user_id}")
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values in one round-trip; missing or unreadable keys come back as None"""
+        if not keys:
+            return []
+        raws: Dict[str, Optional[bytes]] = {}
+        local_ttls = {key: self._local_ttl(key) for key in keys}
+        for key, local_ttl in local_ttls.items():
+            if local_ttl and (raw := self.near_cache.get(key)) is not None:
+                raws[key] = raw
+        misses = [key for key in dict.fromkeys(keys) if key not in raws]
+        try:
+            if misses:
+                generation = self.near_cache.generation
+                async with self.value_client.pipeline(transaction=False) as pipe:
+                    for key in misses:
+                        pipe.get(key)
+                        if local_ttls[key]:
+                            pipe.pttl(key)
+                    results = iter(await pipe.execute())
+                for key in misses:
+                    raws[key] = next(results)
+                    if local_ttls[key]:
+                        self._fill(key, raws[key], next(results), local_ttls[key], generation)
+                    cache_lookups.inc(tier="redis", result="hit" if raws[key] else "miss")
+            return [cache_codec.decode(raws[key]) if raws[key] else None for key in keys]
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+    
+    async def mset(self, values: Dict[str, Any], expire: int = 3600) -> bool:
+        """Set several values with the same expiration in one round-trip"""
+        if not values:
+            return True
+        try:
+            serialized = {key: cache_codec.encode(value) for key, value in values.items()}
+            near_keys = [key for key in serialized if self.near_cache.ttl_for(key)]
+            for key in near_keys:
+                self.near_cache.invalidate(key)
+            async with self.value_client.pipeline(transaction=False) as pipe:
+                for key, value in serialized.items():
+                    pipe.setex(key, expire, value)
+                if near_keys:
+                    pipe.publish(settings.near_cache_channel, self._invalidation(near_keys))
+                await pipe.execute()
+            for key in near_keys:
+                if local_ttl := self._local_ttl(key):
+                    self.near_cache.put(key, serialized[key], min(local_ttl, expire))
+            return True
+        except Exception as e:
+            print(f"Redis mset error: {e}")
+            return False
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit rates and evictions for the near cache and Redis tiers of this process"""
+        redis_hits = cache_lookups.value(tier="redis", result="hit")
+        redis_misses = cache_lookups.value(tier="redis", result="miss")
+        lookups = redis_hits + redis_misses
+        return {
+            "near": {"active": self._near_active, **self.near_cache.snapshot()},
+            "redis": {
+                "hits": redis_hits,
+                "misses": redis_misses,
+                "hit_rate": round(redis_hits / lookups, 4) if lookups else None,
+            },
+        }
+    
+    def start_invalidation_listener(self) -> None:
+        """Subscribe to near-cache invalidations; until subscribed the near cache is bypassed"""
+        if settings.near_cache_enabled and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen_invalidations())
+    
+    async def stop_invalidation_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+    
+    async def _listen_invalidations(self) -> None:
+        while True:
+            pubsub = self.blocking_client.pubsub()
+            try:
+                await pubsub.subscribe(settings.near_cache_channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        # Anything cached before now may have missed an invalidation
+                        self.near_cache.clear()
+                        self._near_active = True
+                    elif message["type"] == "message":
+                        payload = json.loads(message["data"])
+                        if payload.get("origin") != self.origin:
+                            for key in payload.get("keys", []):
+                                self.near_cache.invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis invalidation listener error: {e}")
+            finally:
+                self._near_active = False
+                self.near_cache.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(1.0)
+    
+    def pipeline(self, transaction: bool = False):
+        """Batch raw commands into one round-trip: `async with redis_service.pipeline() as pipe:`"""
+        return self.redis_client.pipeline(transaction=transaction)
+    
+    async def acquire_lock(self, key: str, token: str, expire_ms: int) -> Optional[bool]:
+        """Try to take a lock owned by token (SET NX PX); None if Redis is unavailable"""
+        try:
+            return bool(await self.redis_client.set(key, token, nx=True, px=expire_ms))
+        except Exception as e:
+            print(f"Redis lock error: {e}")
+            return None
+    
+    async def release_lock(self, key: str, token: str) -> bool:
+        """Release a lock only if token still owns it"""
+        try:
+            return bool(await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, key, token))
+        except Exception as e:
+            print(f"Redis unlock error: {e}")
+            return False
+    
+    async def publish(self, channel: str, message: str) -> int:
+        """Publish a message to a pub/sub channel"""
+        try:
+            return await self.redis_client.publish(channel, message)
+        except Exception as e:
+            print(f"Redis publish error: {e}")
+            return 0
+    
+    async def wait_for_message(self, channel: str, timeout: float) -> Optional[str]:
+        """Wait until a message arrives on channel or timeout.
+
+        Waits share one subscriber connection: the first waiter on a channel
+        subscribes it, the last one to leave unsubscribes it.
+        """
+        deadline = time.monotonic() + timeout
+        self._bind()
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(channel, set())
+        waiters.add(future)
+        try:
+            if len(waiters) == 1:
+                await self._subscribe(channel)
+            return await asyncio.wait_for(future, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            return None
+        except Exception as e:
+            print(f"Redis subscribe error: {e}")
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+            return None
+        finally:
+            waiters.discard(future)
+            if not waiters and self._waiters.get(channel) is waiters:
+                del self._waiters[channel]
+                await self._unsubscribe(channel)
+
+    async def _subscribe(self, channel: str) -> None:
+        # Serialized: concurrent first subscribes would each open a connection
+        async with self._subscribing:
+            if self._subscriber is None:
+                self._subscriber = self.blocking_client.pubsub()
+            await self._subscriber.subscribe(channel)
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch(self._subscriber))
+
+    async def _unsubscribe(self, channel: str) -> None:
+        try:
+            if self._subscriber is not None:
+                await self._subscriber.unsubscribe(channel)
+        except Exception as e:
+            print(f"Redis unsubscribe error: {e}")
+
+    async def _dispatch(self, pubsub) -> None:
+        """Hand messages from the shared subscriber to the local waiters on their channel"""
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+                if message and message["type"] == "message":
+                    for future in self._waiters.get(message["channel"], ()):
+                        if not future.done():
+                            future.set_result(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Redis subscriber error: {e}")
+        finally:
+            # Current waiters return early; the next wait subscribes on a new connection
+            if self._subscriber is pubsub:
+                self._subscriber = None
+            for waiters in self._waiters.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_result(None)
+            self._waiters = {}
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+    
+    async def push(self, queue: str, value: str) -> bool:
+        """Append a raw string to the head of a list"""
+        try:
+            return bool(await self.redis_client.lpush(queue, value))
+        except Exception as e:
+            print(f"Redis push error: {e}")
+            return False
+    
+    async def pop(self, queue: str, timeout: float) -> Optional[str]:
+        """Wait until an item is available at the tail of a list"""
+        try:
+            item = await self.blocking_client.brpop([queue], timeout)
+            return item[1] if item else None
+        except Exception as e:
+            print(f"Redis pop error: {e}")
+            await asyncio.sleep(timeout)
+            return None
+    
+    async def claim(self, queue: str, processing: str, timeout: float) -> Optional[str]:
+        """Wait for an item at the tail of a list and move it onto a processing list in the same step"""
+        try:
+            return await self.blocking_client.blmove(queue, processing, timeout, "RIGHT", "LEFT")
+        except Exception as e:
+            print(f"Redis claim error: {e}")
+            await asyncio.sleep(timeout)
+            return None
+    
+    async def ack(self, processing: str, value: str) -> bool:
+        """Drop a finished item from its processing list"""
+        try:
+            return bool(await self.redis_client.lrem(processing, 1, value))
+        except Exception as e:
+            print(f"Redis ack error: {e}")
+            return False
+    
+    async def requeue(self, processing: str, queue: str) -> int:
+        """Return every item of a processing list to the queue, next in line"""
+        try:
+            return await self.redis_client.eval(REQUEUE_SCRIPT, 2, processing, queue)
+        except Exception as e:
+            print(f"Redis requeue error: {e}")
+            return 0
+    
+    async def heartbeat(self, registry: str, member: str, key: str, ttl: float) -> bool:
+        """Register member and mark it alive for ttl seconds"""
+        try:
+            async with self.pipeline() as pipe:
+                pipe.sadd(registry, member)
+                pipe.set(key, "1", px=int(ttl * 1000))
+                await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis heartbeat error: {e}")
+            return False
+    
+    async def expired_members(self, registry: str, key_prefix: str) -> List[str]:
+        """Registered members whose heartbeat key ({key_prefix}{member}) has expired"""
+        try:
+            members = list(await self.redis_client.smembers(registry))
+            if not members:
+                return []
+            async with self.pipeline() as pipe:
+                for member in members:
+                    pipe.exists(f"{key_prefix}{member}")
+                alive = await pipe.execute()
+            return [member for member, exists in zip(members, alive) if not exists]
+        except Exception as e:
+            print(f"Redis expired_members error: {e}")
+            return []
+    
+    async def unregister(self, registry: str, member: str) -> bool:
+        try:
+            return bool(await self.redis_client.srem(registry, member))
+        except Exception as e:
+            print(f"Redis unregister error: {e}")
+            return False
+    
+    async def schedule(self, zset: str, value: str, at: float) -> bool:
+        """Add a raw string to a sorted set scored by a unix timestamp"""
+        try:
+            return bool(await self.redis_client.zadd(zset, {value: at}))
+        except Exception as e:
+            print(f"Redis schedule error: {e}")
+            return False
+    
+    async def pop_due(self, zset: str, now: float, limit: int = 100) -> List[str]:
+        """Remove and return sorted-set members scored at or before now"""
+        try:
+            due = await self.redis_client.zrangebyscore(zset, "-inf", now, start=0, num=limit)
+            # ZREM succeeds for exactly one caller, so concurrent movers never double-claim
+            return [value for value in due if await self.redis_client.zrem(zset, value)]
+        except Exception as e:
+            print(f"Redis pop_due error: {e}")
+            return []
+    
+    async def members_since(self, zset: str, since: float, limit: int = 1000) -> List[str]:
+        """Sorted-set members scored at or after since, most recent first"""
+        try:
+            return await self.redis_client.zrevrangebyscore(zset, "+inf", since, start=0, num=limit)
+        except Exception as e:
+            print(f"Redis members_since error: {e}")
+            return []
+    
+    async def trim_before(self, zset: str, before: float) -> int:
+        """Drop sorted-set members scored before a unix timestamp"""
+        try:
+            return await self.redis_client.zremrangebyscore(zset, "-inf", f"({before}")
+        except Exception as e:
+            print(f"Redis trim_before error: {e}")
+            return 0
+    
+    async def increment_hash(self, key: str, fields: Dict[str, float], expire: int) -> bool:
+        """Add to several hash fields and refresh the key's expiry in one round-trip"""
+        try:
+            async with self.pipeline() as pipe:
+                for field, amount in fields.items():
+                    pipe.hincrbyfloat(key, field, amount)
+                pipe.expire(key, expire)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis increment_hash error: {e}")
+            return False
+    
+    async def get_hash(self, key: str) -> Dict[str, float]:
+        """Read a hash of numeric fields"""
+        try:
+            return {field: float(value) for field, value in (await self.redis_client.hgetall(key)).items()}
+        except Exception as e:
+            print(f"Redis get_hash error: {e}")
+            return {}
+    
+    # A user's sessions share one hash, session:user:{id}, with fields
+    # {session_id}:token (hash of the current refresh secret), :sub, :exp and :meta.
+    
+    async def get_user_session(self, user_id: int) -> Dict[str, Dict[str, Any]]:
+        """Get user sessions by session id"""
+        try:
+            fields = await self.redis_client.hgetall(f"session:user:{user_id}")
+        except Exception as e:
+            print(f"Redis get_user_session error: {e}")
+            return {}
+        sessions: Dict[str, Dict[str, Any]] = {}
+        for field, value in fields.items():
+            session_id, _, name = field.rpartition(":")
+            if name == "meta":
+                sessions.setdefault(session_id, {}).update(json.loads(value))
+            elif name == "exp":
+                sessions.setdefault(session_id, {})["expires_at"] = float(value)
+        return sessions
+    
+    async def set_user_session(self, user_id: int, session_id: str, token_hash: str, subject: str,
+                               expires_at: float, session_data: Dict[str, Any], expire: int = 3600) -> bool:
+        """Set user session data; expire is the idle timeout of the user's sessions"""
+        key = f"session:user:{user_id}"
+        try:
+            async with self.pipeline() as pipe:
+                pipe.hset(key, mapping={
+                    f"{session_id}:token": token_hash,
+                    f"{session_id}:sub": subject,
+                    f"{session_id}:exp": expires_at,
+                    f"{session_id}:meta": json.dumps(session_data, default=str),
+                })
+                pipe.expire(key, expire)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis set_user_session error: {e}")
+            return False
+    
+    async def rotate_user_session(self, user_id: int, session_id: str, presented_hash: str, new_hash: str,
+                                  now: float, expire: int, grace: int) -> Tuple[Optional[int], Optional[str]]:
+        """Swap a session's refresh token in one round-trip: (1, subject), (0, None) rejected, (-1, None) reuse"""
+        try:
+            result = await self.redis_client.eval(
+                ROTATE_SESSION_SCRIPT, 1, f"session:user:{user_id}", session_id, presented_hash, new_hash, now,
+                expire, grace,
+            )
+            return int(result[0]), (result[1] if len(result) > 1 else None)
+        except Exception as e:
+            print(f"Redis rotate_user_session error: {e}")
+            return None, None
+    
+    async def delete_user_session(self, user_id: int, session_id: Optional[str] = None) -> bool:
+        """Delete one session, or all of a user's sessions"""
+        key = f"session:user:{user_id}"
+        try:
+            if session_id is None:
+                return bool(await self.redis_client.delete(key))
+            fields = [f"{session_id}:{name}" for name in ("token", "sub", "exp", "meta", "prev", "rotated")]
+            return bool(await self.redis_client.hdel(key, *fields))
+        except Exception as e:
+            print(f"Redis delete_user_session error: {e}")
+            return False
+    
+    async def delete_user_sessions(self, user_ids: List[int]) -> int:
+        """Delete every session of several users in one round-trip"""
+        if not user_ids:
+            return 0
+        try:
+            return await self.redis_client.delete(*(f"session:user:{user_id}" for user_id in user_ids))
+        except Exception as e:
+            print(f"Redis delete_user_sessions error: {e}")
+            return 0
+    
+    async def scan_session_users(self) -> List[int]:
+        """Ids of users that have sessions"""
+        try:
+            return [int(key.rsplit(":", 1)[1]) async for key in self.redis_client.scan_iter("session:user:*", count=1000)]
+        except Exception as e:
+            print(f"Redis scan_session_users error: {e}")
+            return []
     
-    async def set_user_session(self, user_id: int, session_data: Dict[str, Any], expire: int = 3600) -> bool:
-        """Set user session data"""
-        return await self.set(f"session:user:{user_id}", session_data, expire)
+    def property_tags(self, property_id: int, owner_id: Optional[int] = None) -> List[str]:
+        return [f"property:{property_id}"] + ([f"owner:{owner_id}"] if owner_id is not None else [])
     
-    async def delete_user_session(self, user_id: int) -> bool:
-        """Delete user session data"""
-        return await self.delete(f"session:user:{user_id}")
+    def dashboard_tags(self, user_id: int) -> List[str]:
+        return [f"owner:{user_id}"]
     
-    async def cache_property_data(self, property_id: int, data: Dict[str, Any], expire: int = 1800) -> bool:
+    async def cache_property_data(self, property_id: int, data: Dict[str, Any], expire: int = settings.cache_property_ttl,
+                                  owner_id: Optional[int] = None, versions: Optional[List[str]] = None) -> bool:
         """Cache property data"""
-        return await self.set(f"property:{property_id}", data, expire)
+        return await self.set(f"property:{property_id}", data, expire, self.property_tags(property_id, owner_id), versions)
     
     async def get_cached_property_data(self, property_id: int) -> Optional[Dict[str, Any]]:
         """Get cached property data"""
         return await self.get(f"property:{property_id}")
     
-    async def cache_dashboard_data(self, user_id: int, data: Dict[str, Any], expire: int = 300) -> bool:
+    async def cache_dashboard_data(self, user_id: int, data: Dict[str, Any], expire: int = settings.cache_dashboard_ttl,
+                                   versions: Optional[List[str]] = None) -> bool:
         """Cache dashboard data for user"""
-        return await self.set(f"dashboard:user:{user_id}", data, expire)
+        return await self.set(f"dashboard:user:{user_id}", data, expire, self.dashboard_tags(user_id), versions)
     
     async def get_cached_dashboard_data(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get cached dashboard data for user"""
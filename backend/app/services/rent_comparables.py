@@ -0,0 +1,184 @@
+from typing import List, Dict, Any, Optional
+import threading
+import time
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.property import Property
+
+# Numeric features: bedrooms, bathrooms, log(square_feet)
+NUMERIC_SCALE = np.array([1.0, 0.75, 0.25])
+# Extra distance for each categorical mismatch
+ZIP_PENALTY = 0.5
+CITY_PENALTY = 1.5
+STATE_PENALTY = 4.0
+TYPE_PENALTY = 1.0
+
+
+def _features(bedrooms, bathrooms, square_feet) -> List[float]:
+    return [
+        float(bedrooms) if bedrooms is not None else np.nan,
+        float(bathrooms) if bathrooms is not None else np.nan,
+        float(np.log(square_feet)) if square_feet else np.nan,
+    ]
+
+
+class _Rows:
+    def __init__(self):
+        self.index: Dict[int, int] = {}
+        self.features = np.empty((0, 3))
+        self.rent = np.empty(0)
+        self.sqft = np.empty(0)
+        self.active = np.empty(0, dtype=bool)
+        self.zip = np.empty(0, dtype=object)
+        self.city = np.empty(0, dtype=object)
+        self.state = np.empty(0, dtype=object)
+        self.type = np.empty(0, dtype=object)
+        self.watermark = None
+
+    def upsert(self, rows) -> None:
+        new_rows = []
+        for row in rows:
+            i = self.index.get(row.id)
+            if i is None:
+                new_rows.append(row)
+                continue
+            self.features[i] = _features(row.bedrooms, row.bathrooms, row.square_feet)
+            self.rent[i] = row.rent_amount
+            self.sqft[i] = row.square_feet or np.nan
+            self.active[i] = bool(row.is_active)
+            self.zip[i], self.city[i] = row.zip_code, (row.city or "").lower()
+            self.state[i], self.type[i] = (row.state or "").lower(), (row.property_type or "").lower()
+        if not new_rows:
+            return
+
+        start = len(self.rent)
+        for offset, row in enumerate(new_rows):
+            self.index[row.id] = start + offset
+        self.features = np.vstack([self.features, [_features(r.bedrooms, r.bathrooms, r.square_feet) for r in new_rows]])
+        self.rent = np.concatenate([self.rent, [r.rent_amount for r in new_rows]])
+        self.sqft = np.concatenate([self.sqft, [r.square_feet or np.nan for r in new_rows]])
+        self.active = np.concatenate([self.active, [bool(r.is_active) for r in new_rows]])
+        self.zip = np.concatenate([self.zip, np.array([r.zip_code for r in new_rows], dtype=object)])
+        self.city = np.concatenate([self.city, np.array([(r.city or "").lower() for r in new_rows], dtype=object)])
+        self.state = np.concatenate([self.state, np.array([(r.state or "").lower() for r in new_rows], dtype=object)])
+        self.type = np.concatenate([self.type, np.array([(r.property_type or "").lower() for r in new_rows], dtype=object)])
+
+
+class RentComparables:
+    """In-process k-nearest-neighbour index over active properties.
+
+    Rows live in NumPy arrays and are refreshed incrementally: only rows
+    touched since the last watermark are re-read, and a full rebuild happens
+    only when the row count shows deletions. Estimates are aggregates only;
+    rows belong to every account, so none of them is ever returned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = _Rows()
+        self._checked_at = 0.0
+
+    def _query(self, db: Session):
+        return db.query(
+            Property.id, Property.city, Property.state, Property.zip_code, Property.property_type,
+            Property.bedrooms, Property.bathrooms, Property.square_feet, Property.rent_amount,
+            Property.is_active, func.coalesce(Property.updated_at, Property.created_at).label("changed_at"),
+        )
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        """Pull rows changed since the last refresh (at most every rent_comps_refresh_interval).
+
+        Queries run without the lock; it is only held to apply the changed
+        rows or swap in a rebuilt index, so estimates never wait on the database.
+        """
+        if not force and time.monotonic() - self._checked_at < settings.rent_comps_refresh_interval:
+            return
+        changed_at = func.coalesce(Property.updated_at, Property.created_at)
+        count, watermark = db.query(func.count(Property.id), func.max(changed_at)).one()
+        with self._lock:
+            since, size = self._rows.watermark, len(self._rows.index)
+
+        rows = None
+        if since is not None and count >= size and watermark is not None and (watermark > since or count != size):
+            # >=: rows committed with the same timestamp as the last watermark; upsert dedupes by id
+            rows = self._query(db).filter(changed_at >= since).all()
+        with self._lock:
+            if since is not None and count >= size and self._rows.watermark == since:
+                if rows:
+                    self._rows.upsert(rows)
+                if len(self._rows.index) == count:
+                    self._rows.watermark = watermark or since
+                    self._checked_at = time.monotonic()
+                    return
+
+        # First load, rows were deleted as well as added, or another thread refreshed meanwhile
+        fresh = _Rows()
+        rows = self._query(db).all()
+        fresh.upsert(rows)
+        fresh.watermark = max(filter(None, (row.changed_at for row in rows)), default=None)
+        with self._lock:
+            self._rows = fresh
+            self._checked_at = time.monotonic()
+
+    def estimate(self, target: Dict[str, Any], k: Optional[int] = None) -> Dict[str, Any]:
+        """Recommended rent range for target from its k nearest active comparables"""
+        k = k or settings.rent_comps_k
+        with self._lock:
+            data = self._rows
+            candidates = data.active.copy()
+            own = data.index.get(target.get("id"))
+            if own is not None:
+                candidates[own] = False
+            idx = np.flatnonzero(candidates)
+            if idx.size == 0:
+                return {"comparable_count": 0, "recommended_rent": None, "rent_range": None, "distance_band": None}
+
+            goal = np.array(_features(target.get("bedrooms"), target.get("bathrooms"), target.get("square_feet")))
+            diff = np.abs(data.features[idx] - goal) * NUMERIC_SCALE
+            # Missing values on either side cost a flat 1.0 rather than excluding the row
+            distance = np.where(np.isnan(diff), 1.0, diff).sum(axis=1)
+            distance += ZIP_PENALTY * (data.zip[idx] != target.get("zip_code"))
+            distance += CITY_PENALTY * (data.city[idx] != (target.get("city") or "").lower())
+            distance += STATE_PENALTY * (data.state[idx] != (target.get("state") or "").lower())
+            distance += TYPE_PENALTY * (data.type[idx] != (target.get("property_type") or "").lower())
+
+            k = min(k, idx.size)
+            nearest = np.argpartition(distance, k - 1)[:k]
+            rows = idx[nearest]
+            dist = distance[nearest]
+
+            rents = data.rent[rows].copy()
+            # Scale comparable rents to the target's size when both sides have square footage
+            target_sqft = target.get("square_feet")
+            if target_sqft:
+                sqft = data.sqft[rows]
+                scalable = ~np.isnan(sqft)
+                rents[scalable] = rents[scalable] / sqft[scalable] * target_sqft
+
+        weights = 1.0 / (dist + 0.25)
+        order = np.argsort(rents)
+        cumulative = np.cumsum(weights[order]) / weights.sum()
+        low, mid, high = (float(rents[order][np.searchsorted(cumulative, q)]) for q in (0.25, 0.5, 0.75))
+
+        return {
+            "comparable_count": int(k),
+            "recommended_rent": round(mid, 2),
+            "rent_range": {"low": round(low, 2), "high": round(high, 2)},
+            "current_rent": target.get("rent_amount"),
+            "distance_band": {
+                "nearest": round(float(dist.min()), 3),
+                "mean": round(float(dist.mean()), 3),
+                "farthest": round(float(dist.max()), 3),
+            },
+        }
+
+    def estimate_for(self, db: Session, target: Dict[str, Any], k: Optional[int] = None) -> Dict[str, Any]:
+        """Refresh if due, then estimate"""
+        self.refresh(db)
+        return self.estimate(target, k)
+
+
+# Global instance
+rent_comparables = RentComparables()
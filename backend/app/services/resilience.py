@@ -0,0 +1,182 @@
+from typing import Any, Awaitable, Callable, Optional
+from contextvars import ContextVar
+import asyncio
+import random
+import threading
+import time
+import openai
+from app.config import settings
+from app.metrics import Counter, Gauge
+from app.services.llm_providers import UpstreamError
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+ai_retries = Counter("ai_retries_total", "Upstream completion attempts retried after a transient failure", ["endpoint"])
+ai_hedges = Counter("ai_hedged_requests_total", "Hedged completions by which attempt answered first", ["endpoint", "winner"])
+ai_breaker_state = Gauge("ai_circuit_state", "Upstream circuit breaker state (0 closed, 1 half open, 2 open)")
+ai_breaker_rejections = Counter("ai_circuit_rejections_total", "Completions refused while the circuit was open")
+
+# Absolute time.monotonic() deadline of the request being served, if the caller sent one
+_request_deadline: ContextVar[Optional[float]] = ContextVar("ai_request_deadline", default=None)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open"""
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The time budget for this completion ran out"""
+
+
+def set_request_deadline(seconds: float) -> None:
+    """Bound every AI call made while serving the current request to `seconds` from now"""
+    _request_deadline.set(time.monotonic() + seconds)
+
+
+def deadline_for(endpoint: str, timeout: Optional[float] = None) -> float:
+    """Earliest of the endpoint's deadline, an explicit timeout and the incoming request's deadline"""
+    budget = settings.ai_deadlines.get(endpoint, settings.ai_request_timeout)
+    if timeout is not None:
+        budget = min(budget, timeout)
+    deadline = time.monotonic() + budget
+    request_deadline = _request_deadline.get()
+    if request_deadline is not None:
+        deadline = min(deadline, request_deadline)
+    return deadline
+
+
+def remaining(deadline: float) -> float:
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("AI request deadline exceeded")
+    return left
+
+
+def is_transient(e: BaseException) -> bool:
+    """Failures that say something about upstream health and may succeed on retry"""
+    return isinstance(e, (
+        asyncio.TimeoutError,
+        UpstreamError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    ))
+
+
+def caller_deadline(deadline: float) -> bool:
+    """Whether the incoming request's own deadline, not the endpoint budget, is where `deadline` ends"""
+    request_deadline = _request_deadline.get()
+    return request_deadline is not None and request_deadline <= deadline
+
+
+def is_upstream_failure(e: BaseException, deadline: float) -> bool:
+    """Transient failures the circuit breaker counts against upstream.
+
+    Running out of a deadline the caller chose says nothing about upstream
+    health, and counting it would let any client open the breaker for every
+    request in the worker: only timeouts against the endpoint's own budget count.
+    """
+    if isinstance(e, DeadlineExceeded):
+        return False
+    if isinstance(e, (asyncio.TimeoutError, openai.APITimeoutError)) and caller_deadline(deadline):
+        return False
+    return is_transient(e)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    cap = min(settings.ai_retry_max_delay, settings.ai_retry_base_delay * 2 ** (attempt - 1))
+    return random.uniform(0, cap)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: open after N failures, probe once after the reset timeout"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        ai_breaker_state.set(0)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        ai_breaker_state.set(BREAKER_STATES[state])
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> None:
+        """Raise CircuitOpen unless a call may go upstream now"""
+        with self._lock:
+            if self.state == "open" and self.retry_after() <= 0:
+                self._set_state("half_open")
+            if self.state == "half_open" and not self._probing:
+                # Exactly one probe call decides whether the circuit closes again
+                self._probing = True
+                return
+            if self.state == "closed":
+                return
+        ai_breaker_rejections.inc()
+        raise CircuitOpen(f"AI service temporarily unavailable, retry in {self.retry_after():.0f}s")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release(self) -> None:
+        """Give up a probe slot without a verdict (e.g. the caller was cancelled)"""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "retry_after": round(self.retry_after(), 1)}
+
+
+async def hedged(endpoint: str, call: Callable[[], Awaitable[Any]], delay: float,
+                 semaphore: asyncio.Semaphore) -> Any:
+    """Run call(); if it has not answered after `delay`, race a second copy and keep the first success.
+
+    The hedge only fires when a concurrency slot is free, so hedging never
+    queues behind (or starves) first attempts.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    hedge_slot = False
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or semaphore.locked():
+            return await tasks[0]
+
+        await semaphore.acquire()
+        hedge_slot = True
+        tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    ai_hedges.inc(endpoint=endpoint, winner="primary" if task is tasks[0] else "hedge")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if hedge_slot:
+            semaphore.release()
@@ -0,0 +1,78 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import time
+import uuid
+from app.config import settings
+from app.services.redis_service import redis_service
+
+
+class SingleFlight:
+    """Coalesce concurrent identical computations.
+
+    Callers inside one worker share an in-process future. Across workers a
+    Redis lock elects a leader; everyone else waits on a pub/sub notification
+    and then reads the leader's result via ``load``.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]],
+                 load: Callable[[], Awaitable[Optional[Any]]]) -> Any:
+        """Return compute() for key, running it at most once across concurrent callers.
+
+        ``compute`` must store its result where ``load`` can find it before returning.
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            # The flight runs in its own task: cancelling the caller that started it
+            # must not cancel the computation for everyone else waiting on it
+            flight = asyncio.create_task(self._do_distributed(key, compute, load))
+            self._inflight[key] = flight
+            flight.add_done_callback(lambda task: self._land(key, task))
+        return await asyncio.shield(flight)
+
+    def _land(self, key: str, flight: asyncio.Task) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.cancelled():
+            # Mark retrieved so a flight whose callers all left doesn't log a warning
+            flight.exception()
+
+    async def _do_distributed(self, key: str, compute: Callable[[], Awaitable[Any]],
+                              load: Callable[[], Awaitable[Optional[Any]]]) -> Any:
+        lock_key = f"singleflight:lock:{key}"
+        channel = f"singleflight:done:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + settings.ai_singleflight_wait_timeout
+
+        while True:
+            acquired = await redis_service.acquire_lock(lock_key, token, int(settings.ai_singleflight_lock_ttl * 1000))
+            if acquired is None:
+                # Redis is down: coordination is impossible, fall back to the local flight only
+                return await compute()
+            if acquired:
+                try:
+                    # A previous leader may have finished between our cache miss and the lock
+                    result = await load()
+                    if result is None:
+                        result = await compute()
+                    await redis_service.publish(channel, "done")
+                    return result
+                finally:
+                    await redis_service.release_lock(lock_key, token)
+
+            result = await load()
+            if result is not None:
+                return result
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Leader is taking too long; stop waiting and do the work ourselves
+                return await compute()
+            # Short waits bound the cost of a notification sent before we subscribed
+            await redis_service.wait_for_message(channel, min(settings.ai_singleflight_poll_interval, remaining))
+
+
+# Global instance
+singleflight = SingleFlight()
@@ -1,7 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.config import settings
+from app.database import async_engine
+from app.metrics import registry
 from app.routers import auth, properties, tenants, maintenance, rent, ai
+from app.services import cache_invalidation
+from app.services.ai_jobs import job_queue
+from app.services.ai_service import ai_service
+from app.services.password_hasher import password_hasher
+from app.services.redis_service import redis_service
+from app.services.resilience import set_request_deadline
+import math
 
 app = FastAPI(
     title="Landlord AI Assistant API",
@@ -18,6 +28,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def propagate_deadline(request: Request, call_next):
+    """Bound AI calls made for this request by the caller's own timeout, if it sent one"""
+    timeout = request.headers.get(settings.ai_deadline_header)
+    if timeout:
+        try:
+            seconds = float(timeout)
+        except ValueError:
+            seconds = math.nan
+        # Ignore zero, negative, inf and nan; never extend past the configured maximum
+        if math.isfinite(seconds) and seconds > 0:
+            set_request_deadline(min(seconds, settings.ai_request_timeout))
+    return await call_next(request)
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(properties.router)
@@ -27,6 +53,24 @@ app.include_router(rent.router)
 app.include_router(ai.router)
 
 
+@app.on_event("startup")
+async def startup():
+    cache_invalidation.bind_loop()
+    password_hasher.start()
+    redis_service.start_invalidation_listener()
+    if settings.ai_jobs_backend == "memory":
+        job_queue.start_local_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.stop_local_workers()
+    await ai_service.close()
+    await redis_service.close()
+    await async_engine.dispose()
+    password_hasher.shutdown()
+
+
 @app.get("/")
 def read_root():
     return {"message": "Landlord AI Assistant API"}
@@ -35,3 +79,13 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return registry.render()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return redis_service.cache_stats()
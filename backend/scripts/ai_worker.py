@@ -0,0 +1,67 @@
+"""Background worker for queued AI generations (POST /ai/jobs).
+
+Usage:
+    python -m scripts.ai_worker --processes 2 --concurrency 4
+
+Each process runs --concurrency consumers against the Redis job queue, so
+AI capacity can be scaled separately from the uvicorn web workers. Requires
+AI_JOBS_BACKEND=redis; the in-memory backend runs its workers inside the
+web process instead. Jobs held by a worker that dies are requeued by the
+others once it has missed heartbeats for AI_JOBS_VISIBILITY_TIMEOUT.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+
+from app.config import settings
+
+
+def run_worker(concurrency: int) -> None:
+    from app.services.ai_jobs import job_queue
+    from app.services.ai_service import ai_service
+    from app.services.redis_service import redis_service
+
+    async def main():
+        try:
+            await job_queue.work(concurrency)
+        finally:
+            await ai_service.close()
+            await redis_service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background AI job workers")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=settings.ai_jobs_worker_concurrency,
+                        help="concurrent jobs per process")
+    args = parser.parse_args()
+
+    if settings.ai_jobs_backend != "redis":
+        print("AI_JOBS_BACKEND must be 'redis' to run standalone workers")
+        sys.exit(1)
+
+    print(f"Starting {args.processes} AI worker process(es) x {args.concurrency} slots")
+    if args.processes == 1:
+        run_worker(args.concurrency)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=run_worker, args=(args.concurrency,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
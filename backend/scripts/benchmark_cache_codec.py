@@ -0,0 +1,104 @@
+"""Compare cache codecs on representative payloads: encode/decode time and bytes per entry.
+
+Usage:
+    python -m scripts.benchmark_cache_codec [--iterations 200] [--properties 200]
+
+"legacy" is the previous json.dumps(value, default=str) / json.loads. Every
+other row is cache_codec.encode/decode for a serializer and compression pair
+whose library is installed; compression only applies from
+CACHE_COMPRESSION_THRESHOLD bytes, so small payloads show it as a no-op.
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from app.models.maintenance import MaintenancePriority, MaintenanceStatus
+from app.services import cache_codec
+
+
+def payloads(properties):
+    today = date(2026, 1, 1)
+    insights = {
+        "insights": " ".join(
+            f"Property {i} is renting {i % 7}% below comparable units; consider a renewal increase."
+            for i in range(60)
+        ),
+        "status": "success",
+    }
+    property_list = [
+        {
+            "id": i,
+            "name": f"Property {i}",
+            "address": f"{100 + i} Main Street",
+            "city": "Austin",
+            "rent_amount": 1500.0 + i,
+            "occupancy_rate": 0.75,
+            "lease_end_dates": [today + timedelta(days=30 * k) for k in range(3)],
+            "updated_at": datetime(2026, 1, 1, 12, 0) + timedelta(hours=i),
+        }
+        for i in range(properties)
+    ]
+    maintenance = [
+        {"id": i, "title": "Leaking faucet", "priority": MaintenancePriority.HIGH,
+         "status": MaintenanceStatus.PENDING, "created_at": datetime(2026, 1, 1) + timedelta(days=i)}
+        for i in range(50)
+    ]
+    return {
+        "dashboard (small)": {"ai_insights": {"insights": "Occupancy is stable.", "status": "success"}},
+        "ai insights": insights,
+        f"property list ({properties})": property_list,
+        "maintenance (enums)": maintenance,
+    }
+
+
+def same(a, b):
+    """Equal and of the same types all the way down (a str enum == its value, so check types too)"""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def timed(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def codecs():
+    yield "legacy", lambda v: json.dumps(v, default=str), json.loads
+    for serializer in cache_codec.SERIALIZERS:
+        for compression in cache_codec.COMPRESSIONS:
+            if cache_codec.available(serializer) and cache_codec.available(compression):
+                yield (
+                    f"{serializer}+{compression}",
+                    lambda v, s=serializer, c=compression: cache_codec.encode(v, s, c),
+                    cache_codec.decode,
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cache codecs")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--properties", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"configured: {cache_codec.serializer}+{cache_codec.compression}, "
+          f"threshold {cache_codec.settings.cache_compression_threshold} bytes")
+    for name, value in payloads(args.properties).items():
+        print(f"\n{name}")
+        print(f"  {'codec':<18}{'bytes':>9}{'encode us':>12}{'decode us':>12}  types kept")
+        for codec, encode, decode in codecs():
+            encoded = encode(value)
+            decoded = decode(encoded)
+            print(f"  {codec:<18}{len(encoded):>9}{timed(lambda: encode(value), args.iterations):>12.1f}"
+                  f"{timed(lambda: decode(encoded), args.iterations):>12.1f}  {'yes' if same(decoded, value) else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
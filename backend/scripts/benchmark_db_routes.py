@@ -0,0 +1,83 @@
+"""Throughput and p99 latency of the database-backed CRUD reads (/properties, /rent) under concurrency.
+
+Usage:
+    # on the build to compare against (e.g. before the async engine), API running on :8000
+    python -m scripts.benchmark_db_routes --email owner@example.com --password secret --save before.json
+    # on the new build
+    python -m scripts.benchmark_db_routes --email owner@example.com --password secret --compare before.json
+
+Each path is loaded separately at every --concurrency level with
+scripts.load_test. Run the API with HTTP_RESPONSE_CACHE_ENABLED=false
+(the default) so every request reaches the database, and with the same
+number of workers and the same database for both runs.
+"""
+import argparse
+import asyncio
+import json
+import httpx
+
+from scripts.load_test import run
+
+PATHS = ("/properties/", "/rent/")
+
+
+def login(base_url, email, password):
+    response = httpx.post(f"{base_url}/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def measure(args, token):
+    results = {}
+    for path in args.path or PATHS:
+        for concurrency in args.concurrency:
+            report = asyncio.run(run(args.base_url, token, [path], "GET", None,
+                                     args.requests, concurrency, args.timeout))
+            results[f"{path} c={concurrency}"] = {
+                "rps": report["throughput_rps"],
+                "p99_ms": report["paths"][path].get("p99_ms"),
+                "statuses": report["statuses"],
+            }
+    return results
+
+
+def print_table(results, baseline):
+    print(f"{'route':<26}{'rps':>10}{'p99 ms':>10}" + (f"{'rps before':>12}{'p99 before':>12}" if baseline else ""))
+    for name, row in results.items():
+        line = f"{name:<26}{row['rps']:>10.1f}{row['p99_ms']:>10.1f}"
+        before = baseline.get(name) if baseline else None
+        if before:
+            line += f"{before['rps']:>12.1f}{before['p99_ms']:>12.1f}"
+        if set(row["statuses"]) != {"200"}:
+            line += f"  statuses {row['statuses']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database-backed routes")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", help="bearer token (or pass --email and --password)")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--path", action="append", help=f"path to load (repeatable, default {', '.join(PATHS)})")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save to show alongside")
+    args = parser.parse_args()
+
+    token = args.token or login(args.base_url, args.email, args.password)
+    results = measure(args, token)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Regression check: callers' own short deadlines must not open the AI circuit breaker.
+
+Usage:
+    python -m scripts.check_ai_breaker
+
+Runs against the offline stub provider (no API key, nothing leaves the
+process). Uncached completions and streams are made with a request deadline
+far below the stub's latency, as a client sending a short deadline header
+(settings.ai_deadline_header) would; the breaker must stay closed and a normal call
+must still go through. As a control, the same number of timeouts against
+the endpoint's own budget must open it. Exits non-zero on failure.
+"""
+import argparse
+import asyncio
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that caller deadlines leave the AI breaker closed")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub upstream latency in seconds")
+    parser.add_argument("--deadline", type=float, default=0.05, help="caller request deadline in seconds")
+    args = parser.parse_args()
+
+    from app.config import settings
+
+    settings.ai_stub_latency_mean = args.latency
+    settings.ai_stub_latency_sigma = 0.0
+    settings.ai_stub_error_rate = settings.ai_stub_timeout_rate = 0.0
+    settings.ai_hedge_enabled = False
+
+    from app.services.ai_service import AIService
+    from app.services.llm_providers import StubProvider
+    from app.services.resilience import deadline_for, set_request_deadline
+
+    class BoundedStreamStub(StubProvider):
+        """Stub whose stream gives up at its timeout, as the OpenAI client does"""
+
+        async def stream(self, model, messages, max_tokens, temperature, timeout):
+            if self._plan(model, messages, max_tokens, temperature)["latency"] > timeout:
+                await asyncio.sleep(timeout)
+                raise asyncio.TimeoutError("stub stream exceeded timeout")
+            async for delta in super().stream(model, messages, max_tokens, temperature, timeout):
+                yield delta
+
+    endpoint = "rent"
+    service = AIService()
+    service.provider = BoundedStreamStub()
+    failures = []
+
+    async def complete(i, request_deadline=None):
+        if request_deadline is not None:
+            set_request_deadline(request_deadline)
+        return await service._create_completion(endpoint, "system", f"prompt {i}", 50, 0.7, deadline_for(endpoint))
+
+    async def stream(i, request_deadline):
+        set_request_deadline(request_deadline)
+        return "".join([delta async for delta in service._stream(endpoint, "system", f"stream {i}", 50, use_cache=False)])
+
+    async def expect_timeout(call):
+        try:
+            await call
+        except Exception:
+            return
+        failures.append("a call expected to time out succeeded")
+
+    def check(condition, message):
+        print(("ok    " if condition else "FAIL  ") + message)
+        if not condition:
+            failures.append(message)
+
+    async def run():
+        calls = settings.ai_breaker_failure_threshold + 2
+        # Separate tasks, like separate requests: each carries its own request deadline
+        for i in range(calls):
+            await expect_timeout(asyncio.create_task(complete(i, args.deadline)))
+        check(service.breaker.state == "closed" and service.breaker.failures == 0,
+              f"{calls} completions past a {args.deadline}s caller deadline leave the breaker closed "
+              f"({service.breaker.snapshot()})")
+
+        for i in range(calls):
+            await expect_timeout(asyncio.create_task(stream(i, args.deadline)))
+        check(service.breaker.state == "closed" and service.breaker.failures == 0,
+              f"{calls} streams past a {args.deadline}s caller deadline leave the breaker closed "
+              f"({service.breaker.snapshot()})")
+
+        try:
+            await asyncio.create_task(complete("normal"))
+            check(True, "a call with the normal budget still goes upstream")
+        except Exception as e:
+            check(False, f"a call with the normal budget still goes upstream ({type(e).__name__}: {e})")
+
+        # Control: timeouts against the endpoint's own budget are upstream failures
+        settings.ai_deadlines = {**settings.ai_deadlines, endpoint: args.deadline}
+        for i in range(calls):
+            await expect_timeout(asyncio.create_task(complete(f"budget {i}")))
+        check(service.breaker.state == "open",
+              f"timeouts against the endpoint budget still open the breaker ({service.breaker.snapshot()})")
+
+    asyncio.run(run())
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Local OpenAI-compatible stub server for exercising the AI paths offline.
+
+Usage:
+    python -m scripts.llm_stub_server --port 8099 --latency 8
+
+Then point the backend at it:
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn main:app
+
+Each completion sleeps for --latency seconds (plus optional jitter) before
+answering; streamed requests then emit words at --tokens-per-second. This
+makes it easy to check that one slow /ai request no longer stalls /health
+or the CRUD endpoints.
+
+--error-rate answers that fraction of requests with HTTP 503 and --hang-rate
+holds that fraction open for --hang seconds, for exercising the retries,
+circuit breaker and hedging in AIService.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 5.0
+    jitter = 0.0
+    tokens_per_second = 50.0
+    error_rate = 0.0
+    hang_rate = 0.0
+    hang = 120.0
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        roll = random.random()
+        if roll < self.error_rate:
+            self.send_error(503, "Injected upstream error")
+            return
+        if roll < self.error_rate + self.hang_rate:
+            time.sleep(self.hang)
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        content = json.dumps({"stub": True, "prompt_chars": len(prompt)})
+        if body.get("stream"):
+            self._stream(body, content)
+            return
+
+        payload = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        }
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body, content):
+        """Emit the content word by word as OpenAI-style SSE chunks"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else f" {word}"},
+                    "finish_reason": None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(1.0 / self.tokens_per_second)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=5.0, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of uniform jitter")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="streaming token rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of requests held for --hang seconds")
+    parser.add_argument("--hang", type=float, default=120.0)
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.jitter = args.jitter
+    StubHandler.tokens_per_second = args.tokens_per_second
+    StubHandler.error_rate = args.error_rate
+    StubHandler.hang_rate = args.hang_rate
+    StubHandler.hang = args.hang
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"LLM stub listening on http://{args.host}:{args.port}/v1 (latency {args.latency}s)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
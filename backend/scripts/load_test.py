@@ -0,0 +1,89 @@
+"""Closed-loop HTTP load generator reporting throughput and latency percentiles.
+
+Usage:
+    python -m scripts.load_test --token $TOKEN --path /ai/insights --path /ai/rent-analysis/1 \
+        --requests 500 --concurrency 50
+
+Run the API with AI_PROVIDER=stub (or AI_PROVIDER=replay with recordings in
+AI_REPLAY_DIR) to get repeatable numbers for the /ai routes with no network.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+import httpx
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def run(base_url, token, paths, method, body, total, concurrency, timeout):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    latencies = {path: [] for path in paths}
+    statuses = {}
+    counter = itertools.count()
+    cycle = itertools.cycle(paths)
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    ) as client:
+        async def worker():
+            while next(counter) < total:
+                path = next(cycle)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies[path].append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report = {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "paths": {},
+    }
+    for path, samples in latencies.items():
+        report["paths"][path] = {
+            "count": len(samples),
+            **{f"p{q}_ms": round(percentile(samples, q) * 1000, 1) for q in (50, 95, 99) if samples},
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", help="bearer token from /auth/login")
+    parser.add_argument("--path", action="append", required=True, help="path to hit (repeatable, round-robin)")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--json", help="request body for POST paths")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    body = json.loads(args.json) if args.json else None
+    report = asyncio.run(run(args.base_url, args.token, args.path, args.method, body,
+                             args.requests, args.concurrency, args.timeout))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
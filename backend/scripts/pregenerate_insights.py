@@ -0,0 +1,47 @@
+"""Pre-generate AI insights for recently active owners during off-peak hours.
+
+Usage:
+    python -m scripts.pregenerate_insights            # run passes inside AI_PREGEN_WINDOWS forever
+    python -m scripts.pregenerate_insights --once     # one pass now, if inside a window
+    python -m scripts.pregenerate_insights --once --force   # one pass now, ignoring the windows
+
+Owners are those who opened /ai/insights within AI_PREGEN_ACTIVE_DAYS. An
+owner is skipped when the stored insights were generated from identical
+portfolio data. LLM calls are paced by AI_PREGEN_CALLS_PER_MINUTE and each
+pass stops after AI_PREGEN_TOKEN_BUDGET prompt tokens. Results go to the
+long-lived insights cache that /ai/insights reads first.
+"""
+import argparse
+import asyncio
+import json
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate AI insights off-peak")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    parser.add_argument("--force", action="store_true", help="ignore the off-peak windows")
+    args = parser.parse_args()
+
+    from app.services.ai_service import ai_service
+    from app.services.redis_service import redis_service
+    from app.services.insights_pregen import InsightsPregenerator
+
+    async def run():
+        pregenerator = InsightsPregenerator()
+        try:
+            if args.once:
+                print(json.dumps(await pregenerator.run_pass(force=args.force), indent=2))
+            else:
+                await pregenerator.run_forever()
+        finally:
+            await ai_service.close()
+            await redis_service.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Revoke refresh sessions in bulk, e.g. after a credential leak or a signing key rotation.
+
+Usage:
+    python -m scripts.revoke_sessions --user 12 --user 40   # every session of these users
+    python -m scripts.revoke_sessions --email a@example.com
+    python -m scripts.revoke_sessions --all                 # every session of every user
+
+Access tokens already issued stay valid until they expire
+(ACCESS_TOKEN_EXPIRE_MINUTES); revoked sessions can no longer refresh them.
+"""
+import argparse
+import asyncio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revoke refresh sessions")
+    parser.add_argument("--user", type=int, action="append", default=[], help="user id (repeatable)")
+    parser.add_argument("--email", action="append", default=[], help="user email (repeatable)")
+    parser.add_argument("--all", action="store_true", help="revoke the sessions of every user")
+    args = parser.parse_args()
+    if not (args.user or args.email or args.all):
+        parser.error("pass --user, --email or --all")
+
+    from app.services.redis_service import redis_service
+
+    user_ids = list(args.user)
+    if args.email:
+        from app.database import SessionLocal
+        from app.models.user import User
+
+        db = SessionLocal()
+        try:
+            user_ids += [user_id for (user_id,) in db.query(User.id).filter(User.email.in_(args.email))]
+        finally:
+            db.close()
+
+    async def run():
+        try:
+            ids = await redis_service.scan_session_users() if args.all else user_ids
+            revoked = 0
+            for start in range(0, len(ids), 500):
+                revoked += await redis_service.delete_user_sessions(ids[start:start + 500])
+            print(f"Revoked the sessions of {revoked} users")
+        finally:
+            await redis_service.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Retrain the maintenance triage classifier from historical requests.
+
+Usage:
+    python -m scripts.train_triage [--output models/maintenance_triage.npz] [--holdout 0.2]
+
+Reads title, description and priority from maintenance_requests, reports
+holdout accuracy, then trains on every row and writes the model file that
+the API loads lazily (AI_TRIAGE_MODEL_PATH). Running API processes pick up
+the new file within AI_TRIAGE_RELOAD_INTERVAL seconds.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.maintenance import MaintenanceRequest
+from app.services.maintenance_triage import TriageModel, keyword_category
+
+
+def load_rows():
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            MaintenanceRequest.title, MaintenanceRequest.description, MaintenanceRequest.priority
+        ).filter(MaintenanceRequest.priority.isnot(None)).all()
+    finally:
+        db.close()
+    return [(title or "", description or "", getattr(priority, "value", priority)) for title, description, priority in rows]
+
+
+def evaluate(rows, holdout, alpha, seed):
+    shuffled = rows[:]
+    random.Random(seed).shuffle(shuffled)
+    split = int(len(shuffled) * (1 - holdout))
+    train, test = shuffled[:split], shuffled[split:]
+    if not train or not test:
+        return None
+
+    model = TriageModel.train(train, alpha)
+    started = time.perf_counter()
+    predictions = [model.predict(title, description) for title, description, _ in test]
+    elapsed = time.perf_counter() - started
+    priority_hits = sum(p["priority"] == priority for p, (_, _, priority) in zip(predictions, test))
+    category_hits = sum(
+        p["category"] == keyword_category(f"{title} {description}")
+        for p, (title, description, _) in zip(predictions, test)
+    )
+    urgent = [(p, row) for p, row in zip(predictions, test) if row[2] == "urgent"]
+    return {
+        "train": len(train),
+        "test": len(test),
+        "priority_accuracy": round(priority_hits / len(test), 3),
+        "urgent_recall": round(sum(p["priority"] == "urgent" for p, _ in urgent) / len(urgent), 3) if urgent else None,
+        "category_agreement": round(category_hits / len(test), 3),
+        "predict_ms": round(elapsed / len(test) * 1000, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the maintenance triage classifier")
+    parser.add_argument("--output", default=settings.ai_triage_model_path)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction of rows held out for evaluation")
+    parser.add_argument("--alpha", type=float, default=0.5, help="additive smoothing")
+    parser.add_argument("--min-samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = load_rows()
+    if len(rows) < args.min_samples:
+        print(f"Only {len(rows)} labelled requests; need at least {args.min_samples}", file=sys.stderr)
+        sys.exit(1)
+
+    report = {"rows": len(rows), "evaluation": evaluate(rows, args.holdout, args.alpha, args.seed)}
+    model = TriageModel.train(rows, args.alpha)
+    model.save(args.output)
+    report.update(output=args.output, meta=model.meta)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()